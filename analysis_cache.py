@@ -0,0 +1,108 @@
+# analysis_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+class AnalysisCache:
+    """
+    On-disk (SQLite) cache of per-email analysis results.
+
+    Records are keyed by the SHA-256 of the raw .eml bytes plus a version
+    string, so a renamed or copied file is still a hit while a model or
+    keyword change invalidates everything. A second table remembers the
+    (size, mtime) each path had when it was hashed, which lets a warm restart
+    skip reading unchanged files and pay only a stat per file.
+    """
+
+    def __init__(self, db_path, version):
+        self.version = version
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "digest TEXT, version TEXT, record TEXT, PRIMARY KEY (digest, version))"
+            )
+        self._pruned = False
+        self._files = {
+            path: (size, mtime_ns, digest)
+            for path, size, mtime_ns, digest in self._conn.execute("SELECT * FROM files")
+        }
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, path, stat):
+        """Returns the cached record for `path` if it is unchanged since it was hashed."""
+        known = self._files.get(str(path))
+        if known is None or known[:2] != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return self.get_by_digest(known[2])
+
+    def get_by_digest(self, digest):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM analyses WHERE digest = ? AND version = ?",
+                (digest, self.version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remember(self, path, stat, digest):
+        """Records that `path` (at this size/mtime) has content `digest`."""
+        entry = (stat.st_size, stat.st_mtime_ns, digest)
+        if self._files.get(str(path)) == entry:
+            return
+        self._files[str(path)] = entry
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (str(path), *entry)
+            )
+
+    def put(self, path, stat, digest, record):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?)",
+                (digest, self.version, json.dumps(record)),
+            )
+        self.remember(path, stat, digest)
+
+    def prune(self, live_paths):
+        """Evicts entries for files that no longer exist and records from older versions."""
+        live = {str(p) for p in live_paths}
+        gone = [p for p in self._files if p not in live]
+        if not gone and self._pruned:
+            return
+        for p in gone:
+            del self._files[p]
+        self._pruned = True
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in gone])
+            self._conn.execute(
+                "DELETE FROM analyses WHERE version != ? OR digest NOT IN (SELECT digest FROM files)",
+                (self.version,),
+            )
+
+    def forget(self, paths):
+        """Evicts entries for the given (deleted) paths without touching the rest."""
+        gone = [str(p) for p in paths if str(p) in self._files]
+        if not gone:
+            return
+        for p in gone:
+            del self._files[p]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in gone])
+            self._conn.execute(
+                "DELETE FROM analyses WHERE digest NOT IN (SELECT digest FROM files)"
+            )
+
+    def close(self):
+        self._conn.close()
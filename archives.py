@@ -0,0 +1,127 @@
+# archives.py
+"""
+Message-at-a-time access to mbox and Maildir archives.
+
+Messages are addressed rather than loaded: an mbox message is a MessageRef
+(archive path + byte offset of its "From " line), a Maildir message is just
+the path of its file. Iterating an archive yields these addresses only, and
+`read_message` fetches one message's bytes when it is actually needed, so a
+multi-gigabyte export is walked in constant memory and any single message
+can be reopened later from its "archive.mbox#offset" string.
+"""
+
+import io
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import NamedTuple
+
+from main import parse_eml
+
+_FROM = b"From "
+_SEPARATOR = b"\n" + _FROM
+_ESCAPED_FROM = re.compile(rb"^>(>*From )", re.MULTILINE)  # mboxrd quoting of body lines
+
+
+class MessageRef(NamedTuple):
+    """One message inside an mbox archive; `length` is -1 when only the offset is known."""
+    source: str
+    offset: int
+    length: int = -1
+
+    def __str__(self):
+        return f"{self.source}#{self.offset}"
+
+
+def _open_map(path):
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _next_start(mm, pos):
+    found = mm.find(_SEPARATOR, pos)
+    return -1 if found < 0 else found + 1
+
+
+def is_mbox(path):
+    try:
+        with open(path, "rb") as fh:
+            return fh.read(len(_FROM)) == _FROM
+    except (IsADirectoryError, FileNotFoundError):
+        return False
+
+
+def is_maildir(path):
+    return os.path.isdir(os.path.join(path, "cur")) and os.path.isdir(os.path.join(path, "new"))
+
+
+def iter_mbox(path):
+    """Yields a MessageRef per message of the mbox at `path`, scanning the mapped file for separators."""
+    source = str(path)
+    mm = _open_map(source)
+    if mm is None:
+        return
+    with mm:
+        start = 0 if mm[:len(_FROM)] == _FROM else _next_start(mm, 0)
+        while start != -1:
+            end = _next_start(mm, start + 1)
+            yield MessageRef(source, start, (len(mm) if end == -1 else end) - start)
+            start = end
+
+
+def iter_maildir(path):
+    """Yields the message files of a Maildir (cur/ and new/, then any Maildir++ .subfolders), lazily."""
+    for sub in ("cur", "new"):
+        with os.scandir(os.path.join(path, sub)) as entries:
+            for entry in entries:
+                if not entry.name.startswith(".") and entry.is_file():
+                    yield Path(entry.path)
+    with os.scandir(path) as entries:
+        folders = sorted(e.path for e in entries if e.name.startswith(".") and e.is_dir() and is_maildir(e.path))
+    for folder in folders:
+        yield from iter_maildir(folder)
+
+
+def iter_messages(path):
+    """Expands `path` into message addresses: a Maildir or mbox archive message by message, anything else as itself."""
+    if is_maildir(path):
+        return iter_maildir(path)
+    if is_mbox(path):
+        return iter_mbox(path)
+    return iter([Path(path)])
+
+
+def parse_ref(text):
+    """Inverse of str(): "archive.mbox#1234" becomes a MessageRef, any other string a Path."""
+    source, sep, offset = text.rpartition("#")
+    if sep and offset.isdigit() and os.path.isfile(source):
+        return MessageRef(source, int(offset))
+    return Path(text)
+
+
+def read_message(ref):
+    """Raw RFC 822 bytes of one message, given a MessageRef or the path of a single-message file."""
+    if not isinstance(ref, MessageRef):
+        with open(ref, "rb") as fh:
+            return fh.read()
+    mm = _open_map(ref.source)
+    if mm is None:
+        raise ValueError(f"no mbox message starts at {ref}")
+    with mm:
+        if mm[ref.offset:ref.offset + len(_FROM)] != _FROM:
+            raise ValueError(f"no mbox message starts at {ref}")
+        end = ref.offset + ref.length if ref.length >= 0 else _next_start(mm, ref.offset + 1)
+        raw = mm[ref.offset:len(mm) if end == -1 else end]
+    # Drop the "From " envelope line and the blank line that precedes the next separator.
+    raw = raw[raw.find(b"\n") + 1:]
+    if raw.endswith(b"\n\n"):
+        raw = raw[:-1]
+    return _ESCAPED_FROM.sub(rb"\1", raw)
+
+
+def load_message(ref):
+    """Parses the single message at `ref` (see `read_message`), ready for extract_email_parts."""
+    return parse_eml(io.BytesIO(read_message(ref)))
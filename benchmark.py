@@ -0,0 +1,249 @@
+# benchmark.py
+"""
+Reproducible benchmark for the triage pipeline.
+
+Generates synthetic .eml corpora (plain text, HTML-only, multipart with large
+attachments, long digests) from a fixed seed, times each main.py stage and
+the end-to-end mailbox scan, and writes a JSON baseline:
+
+    python benchmark.py --sizes 100 1000 10000 --output bench_baseline.json
+    python benchmark.py --sizes 100 --compare bench_baseline.json   # exit 1 on regression
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.message import EmailMessage
+from pathlib import Path
+
+KINDS = ("plain", "html", "attachment", "digest")
+
+_PRODUCTS = ["Canvas", "Callista", "StudyLink", "Ascender", "FinanceOne", "Calumo", "Moodle", "Okta", "Exchange"]
+_THREATS = ["ransomware", "phishing campaign", "Cobalt Strike beacon", "credential stuffing", "remote code execution",
+            "SQL injection", "privilege escalation", "data breach", "supply chain compromise"]
+_FILLER = ["Please review the details below.", "This advisory is shared under TLP:AMBER.",
+           "Patches are available from the vendor.", "Contact the service desk with questions.",
+           "Indicators of compromise are listed in the appendix.", "No action is required for unaffected systems.",
+           "Students and staff may receive suspicious emails.", "Monitor authentication logs for anomalies."]
+
+
+def _sentence(rng):
+    cve = f"CVE-{rng.randint(2019, 2026)}-{rng.randint(1000, 49999)}"
+    return rng.choice([
+        f"A {rng.choice(_THREATS)} affecting {rng.choice(_PRODUCTS)} was reported by {rng.choice(['CISA', 'ACSC', 'AusCERT', 'the vendor'])}.",
+        f"{cve} in {rng.choice(_PRODUCTS)} allows {rng.choice(_THREATS)} and is rated {rng.choice(['critical', 'high', 'medium'])}.",
+        f"The university {rng.choice(['IT team', 'SOC', 'security office'])} recommends updating {rng.choice(_PRODUCTS)} immediately.",
+        rng.choice(_FILLER),
+    ])
+
+
+def _paragraphs(rng, count, sentences=(3, 6)):
+    return ["  ".join(_sentence(rng) for _ in range(rng.randint(*sentences))) for _ in range(count)]
+
+
+def make_message(rng, kind, index):
+    msg = EmailMessage()
+    msg["Subject"] = f"[{rng.choice(['ADVISORY', 'ALERT', 'FYI'])}] {rng.choice(_THREATS).title()} in {rng.choice(_PRODUCTS)} #{index}"
+    msg["From"] = f"{rng.choice(['cert', 'soc', 'alerts', 'noreply'])}@{rng.choice(['auscert.org.au', 'cisa.gov', 'vendor.com'])}"
+    msg["Date"] = f"Mon, {rng.randint(1, 28):02d} Jul 2025 {rng.randint(0, 23):02d}:00:00 +1000"
+    msg["Message-ID"] = f"<bench-{kind}-{index}@example.org>"
+    if kind == "plain":
+        msg.set_content("\n\n".join(_paragraphs(rng, rng.randint(2, 5))))
+    elif kind == "html":
+        rows = "".join(f"<tr><td>{p}</td></tr>" for p in _paragraphs(rng, rng.randint(3, 8)))
+        style = "<style>" + ".c{color:#333;padding:4px}" * 2000 + "</style>"
+        msg.set_content(f"<html><head>{style}</head><body><table>{rows}</table><script>track()</script></body></html>", subtype="html")
+    elif kind == "attachment":
+        msg.set_content("\n\n".join(_paragraphs(rng, 2)))
+        size = rng.choice([200_000, 2_000_000, 8_000_000])
+        msg.add_attachment(rng.randbytes(size), maintype="application", subtype="pdf", filename=f"advisory-{index}.pdf")
+    else:  # digest: many forwarded advisories in one body
+        msg.set_content("\n\n-----Forwarded message-----\n\n".join(_paragraphs(rng, rng.randint(40, 120))))
+    return msg
+
+
+def generate_corpus(directory, count, seed=1234, mix=(0.5, 0.2, 0.1, 0.2)):
+    """Writes `count` messages to `directory`, the same ones for the same seed; returns their paths."""
+    rng = random.Random(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        kind = rng.choices(KINDS, weights=mix)[0]
+        path = directory / f"{i:06d}_{kind}.eml"
+        path.write_bytes(bytes(make_message(rng, kind, i)))
+        paths.append(path)
+    return paths
+
+
+def _summary(latencies, count=None, elapsed=None):
+    latencies = sorted(latencies)
+    count = count if count is not None else len(latencies)
+    elapsed = elapsed if elapsed is not None else sum(latencies)
+    return {
+        "count": count,
+        "per_sec": round(count / elapsed, 2) if elapsed else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 3) if latencies else None,
+    }
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS; children covers the (reaped) worker pool.
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(max(own, children) / 2**20, 1)
+
+
+def bench_stages(paths, report_dir):
+    """Times each main.py stage on every message in `paths`."""
+    import main
+    from keywords import DEFAULT_WATCHLIST
+
+    main.preload()
+    stages = {name: [] for name in ("parse_eml", "extract_email_parts", "get_named_entities", "get_relevance_score",
+                                    "summarize_email", "classify_urgency", "generate_report")}
+
+    def timed(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        stages[name].append(time.perf_counter() - start)
+        return result
+
+    for path in paths:
+        with open(path, "rb") as fh:
+            msg = timed("parse_eml", main.parse_eml, fh)
+        parts = timed("extract_email_parts", main.extract_email_parts, msg)
+        body = parts["body_text"]
+        entities = timed("get_named_entities", main.get_named_entities, body)
+        score = timed("get_relevance_score", main.get_relevance_score, body)
+        summary = timed("summarize_email", main.summarize_email, body)
+        urgency = timed("classify_urgency", main.classify_urgency, body, DEFAULT_WATCHLIST, score)
+        timed("generate_report", main.generate_report,
+              dict(parts, entities=entities, summary=summary, urgency=urgency), report_dir)
+    return {name: _summary(latencies) for name, latencies in stages.items()}
+
+
+def bench_scan(directory, workers):
+    """
+    Cold end-to-end scan, as dashboard2.get_emails performs it on first load
+    (no analysis cache). Latencies are triage's own per-email cost (parse plus
+    a share of its spaCy batch); peak RSS is this process's and its pool's, so
+    run it in a fresh process per corpus (see `run_isolated`).
+    """
+    from ingest import MailboxIndex
+    from keywords import DEFAULT_WATCHLIST
+    from triage import iter_triage, make_executor
+
+    executor = make_executor(workers) if workers > 1 else None
+    latencies = []
+
+    def analyse(items):
+        records = {}
+        for path, record, _ in iter_triage([p for p, _ in items], DEFAULT_WATCHLIST, executor, workers=workers):
+            if record:
+                records[path] = record
+                latencies.append(record['triage_seconds'])
+        return records
+
+    try:
+        start = time.perf_counter()
+        index = MailboxIndex(directory, analyse)
+        index.refresh()
+        elapsed = time.perf_counter() - start
+    finally:
+        if executor:
+            executor.shutdown()
+    result = _summary(latencies, count=len(index.emails()), elapsed=elapsed)
+    result["seconds"] = round(elapsed, 3)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def run_isolated(fn, *args):
+    """Runs `fn(*args)` in a fresh spawned process, so its peak RSS is its own rather than the run's high-water mark."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as runner:
+        return runner.submit(fn, *args).result()
+
+
+def compare(results, baseline, tolerance):
+    """Returns human-readable regressions: throughput drops, p95 or peak RSS rises beyond `tolerance`."""
+    problems = []
+
+    def check(label, new, old):
+        if not new or not old:
+            return
+        if old.get("per_sec") and new.get("per_sec") and new["per_sec"] < old["per_sec"] * (1 - tolerance):
+            problems.append(f"{label}: {new['per_sec']}/s vs baseline {old['per_sec']}/s")
+        if old.get("p95_ms") and new.get("p95_ms") and new["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            problems.append(f"{label}: p95 {new['p95_ms']} ms vs baseline {old['p95_ms']} ms")
+        if old.get("peak_rss_mb") and new.get("peak_rss_mb") and new["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            problems.append(f"{label}: peak RSS {new['peak_rss_mb']} MB vs baseline {old['peak_rss_mb']} MB")
+
+    for name, stats in results.get("stages", {}).items():
+        check(f"stage {name}", stats, baseline.get("stages", {}).get(name))
+    for size, stats in results.get("scan", {}).items():
+        check(f"scan {size}", stats, baseline.get("scan", {}).get(size))
+    check("stages", {"peak_rss_mb": results.get("meta", {}).get("stages_peak_rss_mb")},
+          {"peak_rss_mb": baseline.get("meta", {}).get("stages_peak_rss_mb")})
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="corpus sizes for the end-to-end scan")
+    parser.add_argument("--stage-sample", type=int, default=200, help="messages used for per-stage timings")
+    parser.add_argument("--workers", type=int, default=1, help="triage worker processes for the scan")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--corpus-dir", help="keep generated corpora here instead of a temporary directory")
+    parser.add_argument("--output", help="write results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    root = Path(args.corpus_dir or tempfile.mkdtemp(prefix="threat-bench-"))
+    results = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "seed": args.seed, "workers": args.workers},
+        "stages": {}, "scan": {},
+    }
+    try:
+        sample = generate_corpus(root / f"stages_{args.stage_sample}", args.stage_sample, args.seed)
+        results["stages"] = bench_stages(sample, root / "reports")
+        results["meta"]["stages_peak_rss_mb"] = _peak_rss_mb()
+        for size in args.sizes:
+            directory = root / f"scan_{size}"
+            if not directory.exists():
+                generate_corpus(directory, size, args.seed)
+            results["scan"][str(size)] = run_isolated(bench_scan, directory, args.workers)
+            print(f"scan {size}: {results['scan'][str(size)]}", file=sys.stderr)
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        problems = compare(results, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,9 @@
 import streamlit as st
+from keywords import DEFAULT_WATCHLIST
 from main import (
     parse_eml,
     extract_email_parts,
-    get_named_entities,
-    get_relevance_score,
-    summarize_email,
+    analyze_text,
     classify_urgency,
     generate_report,
 )
@@ -40,12 +39,14 @@ if uploaded_file:
     st.write(f"**From:** {result['from']}")
     st.text_area("📬 Body", result["body_text"], height=200)
 
-    entities = get_named_entities(result["body_text"])
-    score = get_relevance_score(result["body_text"])
-    summary = summarize_email(result["body_text"])
+    analysis = analyze_text(result["body_text"])
+    entities = analysis["entities"]
+    score = analysis["similarity"]
+    summary = analysis["summary"]
+    profile_scores = analysis["profile_scores"]
     urgency = classify_urgency(
         result["body_text"],
-        ["university", "callista", "ascender", "studylink", "financeone", "calumo", "student"],
+        DEFAULT_WATCHLIST,
         score,
     )
 
@@ -53,6 +54,8 @@ if uploaded_file:
     st.write(f"**Named Entities:** {', '.join(entities) or 'None found'}")
     st.write(f"**Urgency Level:** 🔺 {urgency}")
     st.write(f"**Similarity Score:** {round(score, 2)}")
+    st.write(f"**Closest Threat Profile:** {analysis['best_profile']} ({round(profile_scores[analysis['best_profile']], 2)})")
+    st.bar_chart(profile_scores)
     st.text_area("📝 Summary", summary, height=100)
 
     # stash for report
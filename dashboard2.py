@@ -4,80 +4,133 @@ from pathlib import Path
 from datetime import datetime
 import time
 import html
-from main_copy import (
-    parse_eml, extract_email_parts, summarize_email, get_named_entities, 
-    classify_urgency, get_relevance_score, generate_report, 
-    ask_sec_chatbot
-)
-import streamlit.components.v1 as components
+from email.utils import parsedate_to_datetime
+from main import ANALYSIS_VERSION
+from analysis_cache import AnalysisCache
+from archives import parse_ref
+from dedup import NearDuplicateIndex
+from ingest import MailboxIndex
+from search_index import SearchIndex
+from sec_chat import SecChatClient
+from report_export import export_reports
+from metrics import metrics
+from keywords import load_watchlist
+from triage import iter_triage, make_executor, triage_batch
 
 # ── Config ─────────────────────────────────────────────────────────────────────
 EMAIL_DIR = Path("/Users/jaysiyani/Desktop/Siyani2.0/onedrive copy")
 REPORT_DIR = Path("reports")
 REPORT_DIR.mkdir(exist_ok=True)
+CACHE_PATH = Path(".threat_cache.sqlite3")
+URGENCY_KEYWORDS = load_watchlist(os.environ.get("THREAT_WATCHLIST"))  # one keyword per line
+FOLLOW_INTERVAL = 2.0  # seconds between background polls of EMAIL_DIR
+METRICS_FILE = os.environ.get("THREAT_METRICS_FILE")  # Prometheus text file, rewritten on each rerun
+METRICS_PORT = os.environ.get("THREAT_METRICS_PORT")  # or served at http://127.0.0.1:<port>/metrics
+TRIAGE_WORKERS = int(os.environ.get("TRIAGE_WORKERS", "1"))  # >1 spreads new files across a process pool
+SEARCH_LIMIT = 250  # best-ranked search hits kept: five pages at the largest page size
 
 # ── Helper Functions & Classes ────────────────────────────────────────────────
-class EMLAttachmentAnalyzer:
-    @staticmethod
-    def has_attachments(msg):
-        try:
-            return EMLAttachmentAnalyzer.check_message_for_attachments(msg)
-        except Exception:
-            return False
-    
-    @staticmethod
-    def check_message_for_attachments(msg):
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get("Content-Disposition") and part.get("Content-Disposition").startswith("attachment"): return True
-                if part.get_filename(): return True
-        return False
-    
-    @staticmethod
-    def get_attachment_info(msg):
-        attachments = []
-        try:
-            if msg.is_multipart():
-                for part in msg.walk():
-                    is_attachment = False
-                    if part.get("Content-Disposition") and "attachment" in part.get("Content-Disposition").lower(): is_attachment = True
-                    elif part.get_filename(): is_attachment = True
-                    
-                    if is_attachment:
-                        payload = part.get_payload(decode=True)
-                        attachments.append({
-                            'filename': part.get_filename() or f'unnamed_{len(attachments) + 1}',
-                            'content_type': part.get_content_type() or 'unknown',
-                            'size': len(payload) if payload else 0
-                        })
-        except Exception: pass
-        return attachments
-
-@st.cache_data(ttl=60)
-def get_emails():
-    data = []
-    if not EMAIL_DIR.exists(): return []
-    for f in sorted(EMAIL_DIR.glob("*.eml"), key=os.path.getctime, reverse=True):
+@st.cache_resource
+def get_analysis_cache():
+    watchlist_digest = AnalysisCache.digest("\n".join(sorted(URGENCY_KEYWORDS)).encode())[:16]
+    return AnalysisCache(CACHE_PATH, f"{ANALYSIS_VERSION}|{watchlist_digest}")
+
+@st.cache_resource
+def get_dedup_index():
+    return NearDuplicateIndex()
+
+@st.cache_resource
+def get_triage_executor():
+    return make_executor(TRIAGE_WORKERS) if TRIAGE_WORKERS > 1 else None
+
+def analyse_files(items):
+    cache = get_analysis_cache()
+    entries, pending = {}, {}
+    for f, stat in items:
         try:
-            with open(f, "rb") as file_handle: msg = parse_eml(file_handle)
-            parts = extract_email_parts(msg)
-            summary = summarize_email(parts['body_text'])
-            similarity = get_relevance_score(parts['body_text'])
-            urgency = classify_urgency(parts['body_text'], ["university","student","canvas","Cobalt Strike"], similarity)
-            entities = get_named_entities(parts['body_text'])
-            has_attachments = EMLAttachmentAnalyzer.has_attachments(msg)
-            attachments = EMLAttachmentAnalyzer.get_attachment_info(msg) if has_attachments else []
-            data.append({
-                "path": f, "filename": f.name, "subject": parts['subject'] or "No Subject", "from": parts['from'] or "Unknown Sender",
-                "summary": summary, "urgency": urgency, "body": parts['body_text'], "entities": entities, "similarity_score": similarity,
-                "has_attachments": has_attachments, "attachments": attachments, "attachment_count": len(attachments),
-                "email_date": msg.get('Date', 'Unknown Date'), "email_id": msg.get('Message-ID', str(f)), "file_size": f.stat().st_size,
-                "created_date": datetime.fromtimestamp(f.stat().st_ctime)
-            })
+            # Warm path: unchanged files are served from the cache after a single stat.
+            record = cache.get(f, stat)
+            if record is None:
+                digest = cache.digest(f.read_bytes())
+                record = cache.get_by_digest(digest)
+                if record is None:
+                    metrics.inc("cache_misses")
+                    pending[f] = (stat, digest)
+                    continue
+                cache.remember(f, stat, digest)
+            metrics.inc("cache_hits")
+            entries[f] = (stat, record)
         except Exception as e:
             print(f"Failed to process {f.name}: {e}")
             continue
-    return data
+    # Cached records are indexed (from their stored signatures) first so new near-duplicates of them
+    # reuse their analysis; iter_triage indexes the new ones itself.
+    dedup = get_dedup_index()
+    dedup.update({f: record for f, (_, record) in entries.items()})
+    # New files run through the per-file pipeline, in parallel when TRIAGE_WORKERS > 1.
+    for f, record, error in iter_triage(pending, URGENCY_KEYWORDS, get_triage_executor(), dedup=dedup, workers=TRIAGE_WORKERS):
+        if error:
+            print(f"Failed to process {f.name}: {error}")
+            continue
+        stat, digest = pending[f]
+        cache.put(f, stat, digest, record)
+        entries[f] = (stat, record)
+    return {
+        f: dict(record, path=f, filename=f.name, email_id=record['email_id'] or str(f), file_size=stat.st_size,
+                created_date=datetime.fromtimestamp(stat.st_ctime))
+        for f, (stat, record) in entries.items()
+    }
+
+@st.cache_data(max_entries=64, show_spinner="Loading archived message...")
+def load_archived_email(address):
+    """Triages the one message at an "archive.mbox#offset" (or Maildir file) address, for the detail page."""
+    ref = parse_ref(address)
+    [(_, record, error)] = triage_batch([ref], URGENCY_KEYWORDS)
+    if error:
+        raise ValueError(error)
+    try:
+        created = parsedate_to_datetime(record['email_date']).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        created = datetime.fromtimestamp(os.stat(getattr(ref, 'source', ref)).st_mtime)
+    return dict(record, path=address, filename=address, email_id=record['email_id'] or address,
+                file_size=len(record['body'].encode()), created_date=created)
+
+@st.cache_resource
+def start_metrics_endpoint():
+    return metrics.serve_prometheus(int(METRICS_PORT)) if METRICS_PORT else None
+
+@st.cache_resource
+def get_chat_client():
+    return SecChatClient()
+
+@st.cache_resource
+def get_search_index():
+    return SearchIndex()
+
+def search_records(term, urgency, limit=None):
+    """Records of the best `limit` search hits, and how many emails matched in all."""
+    mailbox = get_mailbox()
+    keys, total = get_search_index().search(term, urgency=urgency, limit=limit)
+    return [r for r in map(mailbox.record, keys) if r], total
+
+def index_updates(records, removed):
+    get_search_index().update(records, removed)
+    get_dedup_index().update({}, removed)  # new records were indexed by analyse_files / iter_triage
+
+@st.cache_resource
+def get_mailbox():
+    cache = get_analysis_cache()
+    mailbox = MailboxIndex(EMAIL_DIR, analyse_files, forget=cache.forget, on_update=index_updates)
+    mailbox.refresh()
+    cache.prune(mailbox.paths())
+    mailbox.start_following(FOLLOW_INTERVAL)
+    return mailbox
+
+def get_emails():
+    # Cheap when nothing changed: the follower thread keeps the index current between reruns.
+    mailbox = get_mailbox()
+    mailbox.refresh()
+    return mailbox.emails()
 
 def format_file_size(size_bytes):
     if size_bytes == 0: return "0 B"
@@ -88,6 +141,59 @@ def format_file_size(size_bytes):
         i += 1
     return f"{size_bytes:.1f} {size_names[i]}"
 
+URGENCY_CLASSES = {"Red": "critical", "Orange": "medium", "Yellow": "low"}
+PRIORITY_LABELS = {"Red": "CRITICAL", "Orange": "MEDIUM", "Yellow": "LOW"}
+SORT_ORDERS = {
+    "Newest first": lambda e: -e['created_date'].timestamp(),
+    "Oldest first": lambda e: e['created_date'].timestamp(),
+    "Highest risk": lambda e: -risk_score_for(e),
+    "Subject A–Z": lambda e: e['subject'].lower(),
+}
+PAGE_SIZES = [10, 25, 50]
+
+def risk_score_for(email_data):
+    urgency_class = URGENCY_CLASSES.get(email_data['urgency'], "low")
+    return min(10, (email_data['similarity_score'] * 10) + (3 if urgency_class == 'critical' else 1 if urgency_class == 'medium' else 0))
+
+def group_duplicates(records):
+    """Folds near-duplicates into the card of their original when it's among `records`; returns (cards, {original path: copies})."""
+    present = {str(r['path']) for r in records}
+    copies = {}
+    for record in records:
+        if record.get('duplicate_of') in present:
+            copies.setdefault(record['duplicate_of'], []).append(record)
+    return [r for r in records if r.get('duplicate_of') not in present], copies
+
+def render_card_html(email_data, copies=0):
+    urgency_class = URGENCY_CLASSES.get(email_data['urgency'], "low")
+    priority_label = PRIORITY_LABELS.get(email_data['urgency'], "UNKNOWN")
+    risk_score = risk_score_for(email_data)
+    risk_dots_html = "".join([f'<span class="dot filled {urgency_class}"></span>' if j < int(risk_score) else '<span class="dot"></span>' for j in range(10)])
+    trigger_tags_html = "".join(f'<div class="trigger-tag">{html.escape(entity)}</div>' for entity in email_data['entities'][:5])
+    if copies:
+        trigger_tags_html += f'<div class="trigger-tag">+{copies} similar cop{"y" if copies == 1 else "ies"}</div>'
+    subject, summary, sender = html.escape(email_data['subject']), html.escape(email_data['summary']), html.escape(email_data['from'])
+    created = email_data['created_date'].strftime('%d/%m/%Y')
+    # Kept on unindented lines so Markdown doesn't mistake the fragment for a code block.
+    return (
+        f'<div class="threat-card {urgency_class}">'
+        f'<div class="card-header"><div class="card-title"><span class="card-title-icon">⚠️</span>{subject}</div><div class="priority-badge {urgency_class}">{priority_label}</div></div>'
+        f'<div class="card-description">{summary}</div>'
+        f'<div class="card-meta-row">'
+        f'<div class="meta-item"><span>📅</span><span>{created}</span><span style="margin-left: 1rem;">🏢</span><span>{sender}</span></div>'
+        f'<div class="risk-level"><span>Risk Level:</span><div class="risk-dots">{risk_dots_html}</div><div class="risk-score">{int(risk_score)}/10</div></div>'
+        f'</div>'
+        f'<div class="triggers-container"><div class="triggers-label">University Triggers Detected:</div><div class="trigger-tags">{trigger_tags_html}</div></div>'
+        f'</div>'
+    )
+
+def page_of(items, order, page, page_size):
+    """Sorts `items` by a SORT_ORDERS key (unknown orders, e.g. relevance, keep input order) and returns one page."""
+    key = SORT_ORDERS.get(order)
+    if key is not None:
+        items = sorted(items, key=key)
+    return items[(page - 1) * page_size:page * page_size]
+
 # ── Page Config & CSS ──────────────────────────────────────────────────────────
 st.set_page_config("University Threat Triage", layout="wide", page_icon="⚠️", initial_sidebar_state="auto")
 
@@ -148,6 +254,7 @@ if 'current_page' not in st.session_state: st.session_state.current_page = 'main
 if 'selected_email' not in st.session_state: st.session_state.selected_email = None
 if 'filter_priority' not in st.session_state: st.session_state.filter_priority = 'ALL'
 if 'sec_chat_messages' not in st.session_state: st.session_state.sec_chat_messages = []
+if 'page' not in st.session_state: st.session_state.page = 1
 emails = get_emails()
 
 # =================================================================================
@@ -169,12 +276,35 @@ with st.sidebar:
         with st.chat_message("user"):
             st.markdown(prompt)
         
+        # On a report page, the email under review is sent along as context.
+        selected = st.session_state.selected_email if st.session_state.current_page == 'detail' else None
+        context = f"Subject: {selected['subject']}\nFrom: {selected['from']}\nSummary: {selected['summary']}" if selected else ""
         with st.chat_message("assistant"):
-            with st.spinner("Analyzing..."):
-                response = ask_sec_chatbot(prompt)
+            try:
+                response = st.write_stream(get_chat_client().stream(prompt, context))
+            except TimeoutError as e:
+                response = f"⚠️ {e}"
                 st.markdown(response)
         st.session_state.sec_chat_messages.append({"role": "assistant", "content": response})
 
+    # Diagnostics: per-stage latency, counters and the slowest files from the metrics layer.
+    st.markdown("---")
+    with st.expander("🩺 Diagnostics"):
+        metrics.enabled = st.checkbox("Collect pipeline metrics", value=metrics.enabled)
+        start_metrics_endpoint()
+        if metrics.enabled:
+            st.dataframe(metrics.summary(), hide_index=True, use_container_width=True)
+            snapshot = metrics.snapshot()
+            st.json(snapshot["counters"], expanded=False)
+            if snapshot["slowest"]:
+                st.markdown("**Slowest files**")
+                st.dataframe([{"file": Path(p).name, "seconds": round(t, 3)} for t, p in snapshot["slowest"]], hide_index=True, use_container_width=True)
+            if METRICS_FILE:
+                metrics.write_prometheus(METRICS_FILE)
+                st.caption(f"Prometheus metrics written to `{METRICS_FILE}`")
+            if st.button("Reset metrics"):
+                metrics.reset()
+
 # =================================================================================
 # MAIN DASHBOARD PAGE
 # =================================================================================
@@ -201,45 +331,73 @@ if st.session_state.current_page == 'main':
             if b_col4.button("YELLOW", use_container_width=True): st.session_state.filter_priority = 'Yellow'
         with f_col2:
             st.markdown("##### Ｑ Search threats...")
-            search_term = st.text_input("Search", key="search", placeholder="Search by subject, sender, or content...", label_visibility="collapsed")
+            search_term = st.text_input("Search", key="search", placeholder="Search subject, sender, body, entities, attachments...", label_visibility="collapsed")
     
-    filtered_emails = [e for e in emails if (st.session_state.filter_priority == 'ALL' or e['urgency'] == st.session_state.filter_priority) and (not search_term or any(search_term.lower() in str(val).lower() for val in (e['subject'], e['from'], e['summary'])))]
+    urgency_filter = None if st.session_state.filter_priority == 'ALL' else st.session_state.filter_priority
+    if search_term:
+        # Ranked FTS lookup over the index kept in step with ingestion; no per-rerun scan.
+        filtered_emails, matching = search_records(search_term, urgency_filter, limit=SEARCH_LIMIT)
+    else:
+        filtered_emails = [e for e in emails if urgency_filter is None or e['urgency'] == urgency_filter]
+        matching = len(filtered_emails)
+    truncated = matching > SEARCH_LIMIT and bool(search_term)
+    # Near-duplicates (forwards, resends) collapse into their original's card.
+    filtered_emails, duplicate_copies = group_duplicates(filtered_emails)
     
     st.markdown("---")
-    st.markdown(f"**Displaying {len(filtered_emails)} of {len(emails)} threats...**")
-    
-    for i, email_data in enumerate(filtered_emails):
-        urgency_class = {"Red": "critical", "Orange": "medium", "Yellow": "low"}.get(email_data['urgency'], "low")
-        priority_label = {"Red": "CRITICAL", "Orange": "MEDIUM", "Yellow": "LOW"}.get(email_data['urgency'], "UNKNOWN")
-        risk_score = min(10, (email_data['similarity_score'] * 10) + (3 if urgency_class == 'critical' else 1 if urgency_class == 'medium' else 0))
-        risk_dots_html = "".join([f'<span class="dot filled {urgency_class}"></span>' if j < int(risk_score) else '<span class="dot"></span>' for j in range(10)])
-        trigger_tags_html = "".join(f'<div class="trigger-tag">{html.escape(entity)}</div>' for entity in email_data['entities'][:5])
-        
-        card_html = f"""
-            <div class="threat-card {urgency_class}">
-                <div class="card-header"><div class="card-title"><span class="card-title-icon">⚠️</span>{html.escape(email_data['subject'])}</div><div class="priority-badge {urgency_class}">{priority_label}</div></div>
-                <div class="card-description">{html.escape(email_data['summary'])}</div>
-                <div class="card-meta-row">
-                    <div class="meta-item"><span>📅</span><span>{html.escape(email_data['created_date'].strftime('%d/%m/%Y'))}</span><span style="margin-left: 1rem;">🏢</span><span>{html.escape(email_data['from'])}</span></div>
-                    <div class="risk-level"><span>Risk Level:</span><div class="risk-dots">{risk_dots_html}</div><div class="risk-score">{int(risk_score)}/10</div></div>
-                </div>
-                <div class="triggers-container"><div class="triggers-label">University Triggers Detected:</div><div class="trigger-tags">{trigger_tags_html}</div></div>
-            </div>"""
-        
-        components.html(f"<html><head>{GLOBAL_STYLE}</head><body>{card_html}</body></html>", height=280)
+    s_col1, s_col2, s_col3 = st.columns([2, 1, 1])
+    sort_options = (["Relevance"] if search_term else []) + list(SORT_ORDERS)
+    sort_order = s_col1.selectbox("Sort by", sort_options)
+    page_size = s_col2.selectbox("Per page", PAGE_SIZES)
+    pages = max(1, -(-len(filtered_emails) // page_size))
+    page = st.session_state.page = s_col3.number_input("Page", min_value=1, max_value=pages, value=min(st.session_state.page, pages))
+    page_items = page_of(filtered_emails, sort_order, page, page_size)
+    shown = f"the best {len(filtered_emails)} of {matching}" if truncated else len(filtered_emails)
+    st.markdown(f"**Displaying {len(page_items)} of {shown} matching threats ({len(emails)} total) · page {page} of {pages}**")
 
-        if st.button("View Full Report", key=f"details_{i}", use_container_width=True):
-            st.session_state.selected_email = email_data
+    with st.expander(f"📄 Export reports for {'all' if truncated else 'the'} {matching if truncated else len(filtered_emails)} matching threats"):
+        e_col1, e_col2 = st.columns([3, 1])
+        export_mode = e_col1.radio("Format", ["zip", "combined", "files"], horizontal=True,
+                                   format_func={"zip": "Zip of reports", "combined": "One combined report", "files": f"Files in {REPORT_DIR}/"}.get)
+        if e_col2.button("Export", use_container_width=True, disabled=not filtered_emails):
+            # The page only holds the best SEARCH_LIMIT hits; the export covers every match.
+            to_export = group_duplicates(search_records(search_term, urgency_filter)[0])[0] if truncated else filtered_emails
+            with st.spinner(f"Rendering {len(to_export)} reports..."):
+                paths = export_reports(to_export, REPORT_DIR, mode=export_mode)
+            st.success(f"Saved {len(paths)} file(s) to `{REPORT_DIR}`")
+            if export_mode != "files":
+                with open(paths[0], "rb") as fp:
+                    st.download_button("Download", fp, file_name=Path(paths[0]).name,
+                                       mime="application/zip" if export_mode == "zip" else "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+
+    with st.expander("📦 Open a message from an mbox or Maildir archive"):
+        a_col1, a_col2 = st.columns([3, 1])
+        address = a_col1.text_input("Address", placeholder="feeds/2019.mbox#104857 or Maildir/cur/<file>", label_visibility="collapsed")
+        if a_col2.button("Open", use_container_width=True, disabled=not address):
+            try:
+                st.session_state.selected_email = load_archived_email(address.strip())
+                st.session_state.current_page = 'detail'
+                st.rerun()
+            except (OSError, ValueError) as e:
+                st.error(f"Could not load {address}: {e}")
+
+    # One fragment per page, styled by the GLOBAL_STYLE already on the page: no per-card iframes.
+    st.markdown("".join(render_card_html(email_data, len(duplicate_copies.get(str(email_data['path']), []))) for email_data in page_items), unsafe_allow_html=True)
+
+    if page_items:
+        d_col1, d_col2 = st.columns([4, 1])
+        selected = d_col1.selectbox("Open report", range(len(page_items)), format_func=lambda i: page_items[i]['subject'], label_visibility="collapsed")
+        if d_col2.button("View Full Report", use_container_width=True):
+            st.session_state.selected_email = page_items[selected]
             st.session_state.current_page = 'detail'
             st.rerun()
-        st.markdown("<br>", unsafe_allow_html=True)
 
 # =================================================================================
 # DETAIL PAGE
 # =================================================================================
 elif st.session_state.current_page == 'detail' and st.session_state.selected_email:
     email_data = st.session_state.selected_email
-    urgency_class = {"Red": "critical", "Orange": "medium", "Yellow": "low"}.get(email_data['urgency'], "low")
+    urgency_class = URGENCY_CLASSES.get(email_data['urgency'], "low")
     
     if st.button("← Back to Dashboard"):
         st.session_state.current_page = 'main'
@@ -250,7 +408,7 @@ elif st.session_state.current_page == 'detail' and st.session_state.selected_ema
 
     col1, col2 = st.columns([2, 1])
     with col1:
-        risk_score = min(10, (email_data['similarity_score'] * 10) + (3 if urgency_class == 'critical' else 1 if urgency_class == 'medium' else 0))
+        risk_score = risk_score_for(email_data)
         overview_html = f"""
         <div class="detail-card">
             <h3>Threat Overview</h3>
@@ -258,6 +416,7 @@ elif st.session_state.current_page == 'detail' and st.session_state.selected_ema
                 <div><p style="font-size: 0.8rem; color: var(--subtle-text-color); margin: 0;">Date Reported</p><p>{html.escape(email_data['created_date'].strftime('%d/%m/%Y'))}</p></div>
                 <div><p style="font-size: 0.8rem; color: var(--subtle-text-color); margin: 0;">Source</p><p>{html.escape(email_data['from'])}</p></div>
                 <div><p style="font-size: 0.8rem; color: var(--subtle-text-color); margin: 0;">Risk Level</p><p>{int(risk_score)}/10</p></div>
+                <div><p style="font-size: 0.8rem; color: var(--subtle-text-color); margin: 0;">Closest Profile</p><p>{html.escape(str(email_data.get('best_profile')))} ({email_data.get('profile_scores', {}).get(email_data.get('best_profile'), 0):.2f})</p></div>
                 <div><p style="font-size: 0.8rem; color: var(--subtle-text-color); margin: 0;">Priority</p><p>{html.escape(email_data['urgency'].upper())}</p></div>
             </div>
         </div>"""
@@ -286,6 +445,11 @@ elif st.session_state.current_page == 'detail' and st.session_state.selected_ema
             """
             st.markdown(attachments_html, unsafe_allow_html=True)
 
+        similar = [e for e in get_emails() if e.get('duplicate_of') == str(email_data['path'])]
+        if similar:
+            similar_items = "".join(f"<li>📨 {html.escape(e['subject'])} · {html.escape(e['from'])} · {e['created_date'].strftime('%d/%m/%Y')}</li>" for e in similar)
+            st.markdown(f'<div class="detail-card"><h3>Similar Copies ({len(similar)})</h3><ul class="detail-list">{similar_items}</ul></div>', unsafe_allow_html=True)
+
     with col2:
         summary_html = f"""
         <div class="detail-card">
@@ -294,7 +458,8 @@ elif st.session_state.current_page == 'detail' and st.session_state.selected_ema
         </div>"""
         st.markdown(summary_html, unsafe_allow_html=True)
         
-        triggers_list = "".join(f'<li>🎯 {html.escape(e)}</li>' for e in email_data['entities'])
+        fired = dict.fromkeys(k for k, _, _ in email_data.get('keyword_hits', []))
+        triggers_list = "".join(f'<li>🚩 {html.escape(k)}</li>' for k in fired) + "".join(f'<li>🎯 {html.escape(e)}</li>' for e in email_data['entities'])
         st.markdown(f'<div class="detail-card"><h3>University Triggers Detected</h3><ul class="detail-list">{triggers_list}</ul></div>', unsafe_allow_html=True)
         
         st.markdown(f"""
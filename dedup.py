@@ -0,0 +1,179 @@
+# dedup.py
+
+import base64
+import hashlib
+import re
+import threading
+from array import array
+
+from keywords import compile_keywords
+
+_QUOTED_OR_HEADER = re.compile(r"^\s*(?:>.*|(?:from|sent|to|cc|date|subject):.*|-+\s*forwarded message\s*-+)$", re.IGNORECASE | re.MULTILINE)
+_WORD = re.compile(r"\w+")
+_CVE = re.compile(r"\bCVE-\d{4}-\d{4,}\b", re.IGNORECASE)
+
+# Bodies with fewer words than this are never treated as duplicates: empty and one-line
+# bodies (attachment-only mail, "see attached") all look alike whatever they carry.
+MIN_WORDS = 20
+
+# Fields of a triage record that come from spaCy analysis and can be shared by near-duplicates.
+ANALYSIS_FIELDS = ("entities", "summary", "similarity_score", "profile_scores", "best_profile")
+
+
+def normalise(text):
+    """Lower-cased words of `text` with quote markers and forwarding header lines removed."""
+    return _WORD.findall(_QUOTED_OR_HEADER.sub(" ", text).casefold())
+
+
+def shingle_hashes(text, shingle=3):
+    """64-bit hashes of the word `shingle`-grams of the normalised text."""
+    words = normalise(text)
+    grams = (" ".join(words[i:i + shingle]) for i in range(max(len(words) - shingle + 1, 1)))
+    return [int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams]
+
+
+def _simhash(hashes):
+    import numpy as np  # deferred so importing dedup stays cheap
+
+    if not hashes:
+        return 0
+    bits = np.unpackbits(np.array(hashes, dtype="<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(hashes)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+
+def simhash(text, shingle=3):
+    """64-bit SimHash of the word `shingle`-grams of the normalised text."""
+    return _simhash(shingle_hashes(text, shingle))
+
+
+def signature(text, keywords=()):
+    """
+    Dedup fields for a triage record, computed once where the body is parsed:
+    "fingerprint" (hex SimHash, or None when the body is too short to dedup,
+    see MIN_WORDS), "shingles" (its distinct shingle hashes, low 32 bits,
+    packed and base64-encoded so cached records stay JSON) and "dedup_terms"
+    (the CVE IDs and watchlist `keywords` it mentions).
+    """
+    if len(normalise(text)) < MIN_WORDS:
+        return {"fingerprint": None, "shingles": None, "dedup_terms": []}
+    hashes = shingle_hashes(text)
+    shingles = array("I", sorted({h & 0xFFFFFFFF for h in hashes}))
+    terms = {cve.upper() for cve in _CVE.findall(text)}
+    if keywords:
+        terms.update(keyword for keyword, _, _ in compile_keywords(keywords).matches(text))
+    return {
+        "fingerprint": f"{_simhash(hashes):016x}",
+        "shingles": base64.b64encode(shingles.tobytes()).decode("ascii"),
+        "dedup_terms": sorted(terms),
+    }
+
+
+def profile_of(record):
+    """What a match is verified against, decoded from a record's `signature` fields: (shingle array, term set)."""
+    shingles = array("I")
+    shingles.frombytes(base64.b64decode(record.get("shingles") or ""))
+    return shingles, frozenset(record.get("dedup_terms") or ())
+
+
+class NearDuplicateIndex:
+    """
+    SimHash index of analysed email bodies.
+
+    Fingerprints are split into `bands` equal bit ranges and indexed per
+    band; by the pigeonhole principle any fingerprint within `max_distance`
+    bits (max_distance < bands) shares at least one band exactly, so a lookup
+    only compares against a handful of candidates. Each canonical entry also
+    keeps its ANALYSIS_FIELDS so a near-duplicate can reuse them instead of
+    being analysed again.
+
+    A SimHash match alone is not enough: advisories that share a page of
+    vendor boilerplate land within a few bits of each other. Candidates are
+    therefore verified against the entry's profile (see `profile_of`): the
+    exact Jaccard similarity of their shingle sets must reach `min_jaccard`,
+    and both must mention the same CVE IDs and fire the same keywords.
+    """
+
+    def __init__(self, max_distance=3, bands=4, min_jaccard=0.9):
+        if max_distance >= bands:
+            raise ValueError("max_distance must be smaller than bands for lookups to be exact")
+        self.max_distance = max_distance
+        self.bands = bands
+        self.min_jaccard = min_jaccard
+        self._width = 64 // bands
+        self._buckets = [{} for _ in range(bands)]  # band value -> set of keys
+        self._fingerprints = {}                     # key -> fingerprint
+        self._profiles = {}                         # key -> (shingle array, distinguishing terms)
+        self._analyses = {}                         # key -> analysis fields, once known
+        self._lock = threading.Lock()
+
+    def _verified(self, key, profile):
+        stored = self._profiles.get(key)
+        if stored is None or profile is None:
+            return stored is None and profile is None
+        (mine, my_terms), (theirs, their_terms) = profile, stored
+        if my_terms != their_terms:
+            return False
+        shared = len(set(mine).intersection(theirs))
+        return shared / (len(mine) + len(theirs) - shared or 1) >= self.min_jaccard
+
+    def _bands(self, fp):
+        mask = (1 << self._width) - 1
+        return [(fp >> (i * self._width)) & mask for i in range(self.bands)]
+
+    def find(self, fp, profile=None):
+        """
+        Returns the key of the closest indexed fingerprint within
+        `max_distance` bits whose entry also passes verification against
+        `profile`, or None.
+        """
+        with self._lock:
+            candidates = set()
+            for bucket, value in zip(self._buckets, self._bands(fp)):
+                candidates |= bucket.get(value, set())
+            distances = sorted((bin(self._fingerprints[k] ^ fp).count("1"), str(k), k) for k in candidates)
+            for distance, _, key in distances:
+                if distance > self.max_distance:
+                    break
+                if self._verified(key, profile):
+                    return key
+            return None
+
+    def add(self, key, fp, analysis=None, profile=None):
+        with self._lock:
+            self._fingerprints[key] = fp
+            for bucket, value in zip(self._buckets, self._bands(fp)):
+                bucket.setdefault(value, set()).add(key)
+            if profile is not None:
+                self._profiles[key] = profile
+            if analysis is not None:
+                self._analyses[key] = analysis
+
+    def set_analysis(self, key, analysis):
+        with self._lock:
+            self._analyses[key] = analysis
+
+    def analysis(self, key):
+        return self._analyses.get(key)
+
+    def remove(self, key):
+        with self._lock:
+            fp = self._fingerprints.pop(key, None)
+            self._profiles.pop(key, None)
+            self._analyses.pop(key, None)
+            if fp is not None:
+                for bucket, value in zip(self._buckets, self._bands(fp)):
+                    bucket.get(value, set()).discard(key)
+
+    def update(self, records, removed=()):
+        """
+        Indexes canonical (non-duplicate) records from their stored signature
+        fields, without rehashing bodies, and drops `removed` keys; fits
+        MailboxIndex's on_update.
+        """
+        for key in removed:
+            self.remove(str(key))
+        for key, record in records.items():
+            if record.get("fingerprint") and not record.get("duplicate_of"):
+                self.add(str(key), int(record["fingerprint"], 16), {f: record.get(f) for f in ANALYSIS_FIELDS},
+                         profile_of(record))
@@ -0,0 +1,198 @@
+# html_text.py
+
+import re
+from html.parser import HTMLParser
+
+# — Extraction budget —
+MAX_TEXT_CHARS = 200_000   # extraction stops once this much text has been collected
+CHUNK_CHARS = 64 * 1024    # HTML is fed to the parser in chunks of this size, so a cap stops it early
+
+# Elements whose content is never shown, and void elements (no end tag, so never skipped).
+SKIP_TAGS = {"script", "style", "head", "template", "noscript", "svg"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Block-level elements that end a line; paragraph-like ones leave a blank line, which
+# is what add_report_section and the summarizer treat as a paragraph break. Each <br>
+# adds a line break of its own, so <br><br> leaves a blank line too.
+LINE_TAGS = {"div", "li", "tr", "dt", "dd", "hr", "section", "article", "header", "footer", "address", "caption"}
+PARAGRAPH_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "table", "ul", "ol", "dl", "form"}
+# A skipped element whose end tag may be omitted ends where a browser closes it
+# implicitly: at the start of a sibling (any block, for <p>) or at the end of
+# its container. <head> ends at the first tag that can't appear in it.
+HEAD_TAGS = {"head", "title", "meta", "link", "style", "script", "base", "noscript", "template"}
+_TABLE_PARTS = {"table", "thead", "tbody", "tfoot"}
+IMPLIED_END = {
+    "p": (LINE_TAGS | PARAGRAPH_TAGS, (LINE_TAGS | PARAGRAPH_TAGS | {"td", "th", "body"}) - {"p"}),
+    "li": ({"li"}, {"ul", "ol"}),
+    "dt": ({"dt", "dd"}, {"dl"}),
+    "dd": ({"dt", "dd"}, {"dl"}),
+    "tr": ({"tr"} | _TABLE_PARTS, _TABLE_PARTS),
+    "td": ({"td", "th", "tr"} | _TABLE_PARTS, {"tr"} | _TABLE_PARTS),
+    "th": ({"td", "th", "tr"} | _TABLE_PARTS, {"tr"} | _TABLE_PARTS),
+}
+
+_SPACES = re.compile(r"\s+")
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class _TextCollector:
+    """
+    Parser-agnostic sink for start/end/data events (the lxml target
+    interface, also driven by the stdlib fallback). Whitespace is collapsed as
+    a browser would, outside <pre>; skipped and hidden elements are dropped
+    as they stream past rather than pruned from a tree afterwards.
+    """
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.size = 0
+        self._parts = []
+        self._skip = None    # [tag, nesting, open containers] of the element being skipped
+        self._pre = 0
+        self._breaks = 2     # pending newlines owed to the output; 2 at the start swallows leading ones
+
+    @property
+    def full(self):
+        return self.size >= self.max_chars
+
+    def _newline(self, count):
+        self._breaks = max(self._breaks, count)
+
+    def _break(self):
+        self._breaks = min(self._breaks + 1, 2)
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if self._skip is not None:
+            skipped, _, containers = self._skip
+            closed_by, inside = IMPLIED_END.get(skipped, ((), ()))
+            if not (skipped == "head" and tag not in HEAD_TAGS or tag in closed_by and not containers):
+                self._skip[1] += tag == skipped
+                self._skip[2] += tag in inside  # e.g. a nested list, whose <li>s aren't siblings
+                return
+            self._skip = None  # implicitly closed; `tag` is a sibling or body content, handled below
+        attrs = dict(attrs or ())
+        hidden = "hidden" in attrs or _HIDDEN_STYLE.search(attrs.get("style") or "")
+        if tag in SKIP_TAGS or (hidden and tag not in VOID_TAGS):
+            self._skip = [tag, 1, 0]
+        elif tag == "br":
+            self._break()
+        elif tag == "pre":
+            self._pre += 1
+            self._newline(2)
+        elif tag in PARAGRAPH_TAGS:
+            self._newline(2)
+        elif tag in LINE_TAGS:
+            self._newline(1)
+        elif tag in ("td", "th"):
+            self.data(" ")
+
+    def end(self, tag):
+        tag = tag.lower()
+        if self._skip is not None:
+            skipped, _, containers = self._skip
+            if tag == skipped:
+                self._skip[1] -= 1
+                if not self._skip[1]:
+                    self._skip = None
+                return
+            _, inside = IMPLIED_END.get(skipped, ((), ()))
+            if tag not in inside:
+                return
+            if containers:
+                self._skip[2] -= 1
+                return
+            self._skip = None  # its container ended, closing it too; the container's own end is handled below
+        if tag == "pre":
+            self._pre = max(self._pre - 1, 0)
+        if tag in PARAGRAPH_TAGS:
+            self._newline(2)
+        elif tag in LINE_TAGS:
+            self._newline(1)
+
+    def data(self, text):
+        if self._skip is not None or self.full:
+            return
+        if not self._pre:
+            text = _SPACES.sub(" ", text)
+            if self._breaks or (self._parts and self._parts[-1].endswith(" ")):
+                text = text.lstrip(" ")
+        if not text:
+            return
+        if self._breaks:
+            if self._parts:
+                self._parts[-1] = self._parts[-1].rstrip(" ")
+                self._parts.append("\n" * self._breaks)
+            self._breaks = 0
+        self._parts.append(text)
+        self.size += len(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        text = "".join(self._parts)[:self.max_chars]
+        return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, attrs)
+        if tag.lower() not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def _lxml_parser(collector):
+    try:
+        from lxml import etree
+    except ImportError:
+        return None
+    return etree.HTMLParser(target=collector, remove_comments=True, remove_pis=True)
+
+
+def _stdlib_parser(collector):
+    return _StdlibParser(collector)
+
+
+# Tried in order; the first one whose dependency is importable does the work.
+BACKENDS = {"lxml": _lxml_parser, "stdlib": _stdlib_parser}
+
+
+def html_to_text(html, max_chars=MAX_TEXT_CHARS, backend=None):
+    """
+    Visible text of an HTML document, with block-level elements on their own
+    lines and script, style and hidden elements dropped. Parsing stops at
+    the first chunk boundary after `max_chars` characters of text, so a
+    multi-megabyte newsletter costs no more than its first screenfuls.
+    `backend` forces one of BACKENDS (e.g. "stdlib"); by default lxml is
+    used when installed.
+    """
+    collector = _TextCollector(max_chars)
+    for name in ([backend] if backend else BACKENDS):
+        parser = BACKENDS[name](collector)
+        if parser is not None:
+            break
+    else:
+        raise ImportError(f"HTML backend {backend!r} is not installed")
+    for i in range(0, len(html), CHUNK_CHARS):
+        parser.feed(html[i:i + CHUNK_CHARS])
+        if collector.full:
+            break
+    try:
+        parser.close()
+    except Exception:
+        pass  # stopped mid-document; what was collected stands
+    return collector.close()
@@ -0,0 +1,147 @@
+# ingest.py
+
+import bisect
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class MailboxIndex:
+    """
+    Incremental view of a folder of .eml files.
+
+    Keeps a manifest of (size, mtime, ctime) per file and, on `refresh`, hands
+    only added or modified files to `analyse`; removed files are dropped and
+    reported to `forget`. `on_update`, if given, is called with the new
+    records (path -> record) and the removed paths after every non-empty
+    refresh, e.g. to keep a search index in step. A refresh first compares the directory's own mtime,
+    which changes whenever an entry is added, removed or renamed, so an idle
+    mailbox costs one stat per poll rather than a rescan. In-place edits do
+    not touch the directory mtime, so files added or changed by the previous
+    refresh are re-statted on the next one (a file still being written keeps
+    being picked up until it stops growing), and a full rescan is still
+    forced every `full_scan_interval` seconds.
+
+    `analyse` is called with a list of (path, stat) pairs and returns a dict
+    mapping path -> record; paths missing from the result are treated as
+    failures and are not retried until the file changes again.
+    """
+
+    def __init__(self, directory, analyse, forget=None, on_update=None, suffix=".eml", full_scan_interval=300.0):
+        self.directory = Path(directory)
+        self.analyse = analyse
+        self.forget = forget
+        self.on_update = on_update
+        self.suffix = suffix
+        self.full_scan_interval = full_scan_interval
+        self._manifest = {}   # path -> (size, mtime_ns, ctime)
+        self._records = {}    # path -> record
+        self._order = []      # sorted (-ctime, path): newest first
+        self._dir_mtime = None
+        self._last_full_scan = 0.0
+        self._settling = set()  # paths added or changed by the last refresh
+        self._lock = threading.RLock()
+        self._follower = None
+
+    def refresh(self, force=False):
+        """Brings the index up to date; returns (added, changed, removed) path lists."""
+        with self._lock:
+            try:
+                dir_mtime = os.stat(self.directory).st_mtime_ns
+            except FileNotFoundError:
+                return self._apply({}, removed=list(self._manifest))
+            due = time.monotonic() - self._last_full_scan >= self.full_scan_interval
+            if not force and not due and dir_mtime == self._dir_mtime:
+                return self._apply(self._restat(self._settling), removed=[])
+
+            current = {}
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.suffix) and entry.is_file():
+                        current[Path(entry.path)] = entry.stat()
+            todo = {
+                path: stat for path, stat in current.items()
+                if self._manifest.get(path) != (stat.st_size, stat.st_mtime_ns, stat.st_ctime)
+            }
+            removed = [path for path in self._manifest if path not in current]
+            changes = self._apply(todo, removed)
+            self._dir_mtime = dir_mtime
+            self._last_full_scan = time.monotonic()
+            return changes
+
+    def _restat(self, paths):
+        todo = {}
+        for path in paths:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # the unlink bumps the directory mtime; the next scan drops it
+            if self._manifest.get(path) != (stat.st_size, stat.st_mtime_ns, stat.st_ctime):
+                todo[path] = stat
+        return todo
+
+    def _apply(self, todo, removed):
+        self._settling = set(todo)
+        if not todo and not removed:
+            return [], [], []
+        added = [path for path in todo if path not in self._manifest]
+        changed = [path for path in todo if path in self._manifest]
+        for path in removed + changed:
+            self._drop(path)
+        results = self.analyse(list(todo.items())) if todo else {}
+        for path, stat in todo.items():
+            self._manifest[path] = (stat.st_size, stat.st_mtime_ns, stat.st_ctime)
+            if path in results:
+                self._records[path] = results[path]
+                bisect.insort(self._order, (-stat.st_ctime, path))
+        if removed and self.forget:
+            self.forget(removed)
+        if (results or removed or changed) and self.on_update:
+            self.on_update(results, removed + [path for path in changed if path not in results])
+        return added, changed, removed
+
+    def _drop(self, path):
+        entry = self._manifest.pop(path, None)
+        if self._records.pop(path, None) is not None:
+            key = (-entry[2], path)
+            i = bisect.bisect_left(self._order, key)
+            if i < len(self._order) and self._order[i] == key:
+                del self._order[i]
+
+    def paths(self):
+        with self._lock:
+            return list(self._manifest)
+
+    def record(self, path):
+        with self._lock:
+            return self._records.get(Path(path))
+
+    def emails(self):
+        """Returns the analysed records, newest (by ctime) first."""
+        with self._lock:
+            return [self._records[path] for _, path in self._order]
+
+    def follow(self, interval=2.0, stop=None):
+        """Polls the directory every `interval` seconds, yielding each non-empty change set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            changes = self.refresh()
+            if any(changes):
+                yield changes
+            stop.wait(interval)
+
+    def start_following(self, interval=2.0, on_change=None):
+        """Runs `follow` on a daemon thread; returns the Event that stops it."""
+        if self._follower is not None:
+            return self._follower
+        stop = threading.Event()
+
+        def run():
+            for changes in self.follow(interval, stop):
+                if on_change:
+                    on_change(*changes)
+
+        threading.Thread(target=run, name="mailbox-follower", daemon=True).start()
+        self._follower = stop
+        return stop
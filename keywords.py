@@ -0,0 +1,85 @@
+# keywords.py
+
+import re
+from functools import lru_cache
+
+# — Default urgency watchlist (product names, threat names); override with a watchlist file —
+DEFAULT_WATCHLIST = [
+    "university", "universities", "student", "students",
+    "canvas", "callista", "ascender", "studylink", "financeone", "calumo",
+    "cobalt strike",
+]
+
+
+def _normalise(text):
+    return " ".join(text.casefold().split())
+
+
+def _trie_pattern(node):
+    """Turns a character trie into a regex whose cost per position is bounded by keyword length."""
+    alternatives, optional = [], False
+    for char in sorted(node):
+        if char == "":
+            optional = True
+            continue
+        # Any run of whitespace in the text matches a single space in a keyword.
+        alternatives.append((r"\s+" if char == " " else re.escape(char)) + _trie_pattern(node[char]))
+    if not alternatives:
+        return ""
+    pattern = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+    return f"(?:{pattern})?" if optional else pattern
+
+
+class KeywordMatcher:
+    """
+    Single-pass, case-insensitive matcher for a keyword watchlist.
+
+    The keywords are folded into one character trie and compiled once into a
+    single regex anchored on word boundaries, so the text is scanned once no
+    matter how many keywords are watched and "canvas" does not fire inside
+    "canvassing".
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted({_normalise(k) for k in keywords if k and k.strip()})
+        trie = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self._regex = re.compile(rf"(?<!\w){_trie_pattern(trie)}(?!\w)", re.IGNORECASE) if self.keywords else None
+
+    def finditer(self, text):
+        """Yields (keyword, start, end) for every non-overlapping match in `text`."""
+        if self._regex is None:
+            return
+        for m in self._regex.finditer(text):
+            yield _normalise(m.group()), m.start(), m.end()
+
+    def matches(self, text):
+        return list(self.finditer(text))
+
+    def search(self, text):
+        """True if any keyword occurs in `text`; stops at the first hit."""
+        return self._regex is not None and self._regex.search(text) is not None
+
+
+@lru_cache(maxsize=32)
+def _compile(keywords):
+    return KeywordMatcher(keywords)
+
+
+def compile_keywords(keywords):
+    """Returns a (cached) KeywordMatcher for `keywords`, which may already be one."""
+    if isinstance(keywords, KeywordMatcher):
+        return keywords
+    return _compile(tuple(keywords))
+
+
+def load_watchlist(path=None):
+    """Reads one keyword per line (blank lines and '#' comments ignored); no path gives the default list."""
+    if not path:
+        return list(DEFAULT_WATCHLIST)
+    with open(path, encoding="utf-8") as fh:
+        return [line.split("#", 1)[0].strip() for line in fh if line.split("#", 1)[0].strip()]
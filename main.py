@@ -1,62 +1,262 @@
 # main_copy.py
 
+import hashlib
+import io
+import json
 import os
+import re
+import threading
 from email import policy
 from email.parser import BytesParser
-from bs4 import BeautifulSoup
-import spacy
-from docx import Document
 from datetime import datetime
+from importlib import metadata
 
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.text_rank import TextRankSummarizer
+from html_text import html_to_text
+from keywords import compile_keywords
+from metrics import metrics
+from summary import MAX_SUMMARY_CHARS, MAX_TEXTRANK_SENTENCES, SummaryMemo, summarize_sentences
 
-# Import the function for the security chatbot
-from chatbot import get_featherless_response as get_sec_bot_response
+# spaCy, the model, python-docx and the chatbot are imported on
+# first use, so importing this module (e.g. just to call parse_eml) stays cheap.
 
-# — Load spaCy model —
-nlp = spacy.load("en_core_web_md")
+# — spaCy model —
+MODEL_NAME = "en_core_web_md"
+
+# — Pipeline components each analysis feature needs; the rest are disabled for the run —
+FEATURE_COMPONENTS = {
+    "entities": ("ner",),                # ner carries its own embedding layer
+    "similarity": (),                    # static word vectors only need the tokenizer
+    "summary": ("tok2vec", "parser"),    # sentence boundaries come from the dependency parser
+}
+ALL_FEATURES = tuple(FEATURE_COMPONENTS)
+# Components no feature uses are never loaded at all.
+EXCLUDED_COMPONENTS = ("tagger", "attribute_ruler", "lemmatizer")
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+# — Analysis version: bump the suffix whenever analysis output changes shape or meaning —
+ANALYSIS_VERSION = f"{MODEL_NAME}-{_package_version(MODEL_NAME)}-a9"
+
+# — Reference threat description; it and the threat profiles are embedded when the model loads —
+REFERENCE_TEXT = "Critical, Cobalt Strike, cybersecurity, threat, affecting university systems, students, and campus infrastructure."
+REFERENCE_PROFILE = "university"
+
+_nlp = None
+_profile_scorer = None
+_load_lock = threading.Lock()
+
+def get_nlp():
+    """Loads the trimmed spaCy pipeline and the profile vectors on first call; later calls are free."""
+    global _nlp, _profile_scorer
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                import spacy
+                from profiles import THREAT_PROFILES, ProfileScorer
+                nlp = spacy.load(MODEL_NAME, exclude=list(EXCLUDED_COMPONENTS))
+                with nlp.select_pipes(disable=nlp.pipe_names):
+                    _profile_scorer = ProfileScorer.from_texts(nlp, {REFERENCE_PROFILE: REFERENCE_TEXT, **THREAT_PROFILES})
+                _nlp = nlp
+    return _nlp
+
+def preload():
+    """Loads the models now, e.g. once per long-lived worker process rather than on its first email."""
+    get_nlp()
+
+def _disabled_for(nlp, features):
+    needed = {name for feature in features for name in FEATURE_COMPONENTS[feature]}
+    return [name for name in nlp.pipe_names if name not in needed]
+
+def __getattr__(name):
+    # `main.nlp` / `main.profile_scorer` keep working, but only load the model when touched.
+    if name == "nlp":
+        return get_nlp()
+    if name == "profile_scorer":
+        get_nlp()
+        return _profile_scorer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def parse_eml(uploaded_file):
-    return BytesParser(policy=policy.default).parse(uploaded_file)
+    with metrics.stage("parse_eml"):
+        return BytesParser(policy=policy.default).parse(uploaded_file)
 
-def extract_email_parts(msg):
-    subject = msg["subject"]
-    sender = msg["from"]
-    body = ""
+def _is_attachment(part):
+    disposition = part.get("Content-Disposition")
+    return bool((disposition and "attachment" in disposition.lower()) or part.get_filename())
+
+def _encoded_size(part):
+    """
+    Estimates an attachment's decoded size from its still-encoded payload, so
+    large attachments are never base64-decoded just to be measured.
+    """
+    payload = part.get_payload(decode=False)
+    if not isinstance(payload, str):
+        return 0
+    cte = part.get("Content-Transfer-Encoding", "").strip().lower()
+    if cte == "base64":
+        # Every 4 base64 characters encode 3 bytes; whitespace and "=" padding carry none.
+        chars = len(payload) - sum(payload.count(c) for c in "\r\n\t ")
+        end = len(payload)
+        while end and payload[end - 1] in "\r\n\t ":
+            end -= 1
+        padding = (payload[end - 1] == "=") + (payload[end - 2] == "=") if end >= 2 else 0
+        return max(0, chars * 3 // 4 - padding)
+    if cte == "quoted-printable":
+        # "=XX" escapes and "=\n" soft breaks each shrink by two characters when decoded.
+        return max(0, len(payload) - 2 * payload.count("="))
+    return len(payload.encode("utf-8", "surrogateescape"))
+
+def _html_body(part):
+    html = part.get_content()
+    with metrics.stage("html_to_text"):
+        return html_to_text(html)
+
+def inspect_message(msg):
+    """
+    Walks the MIME tree once and returns the body text together with the
+    attachment list (filename, content type and estimated size).
+    """
+    body = None
+    attachments = []
     if msg.is_multipart():
         for part in msg.walk():
+            if part.is_multipart():
+                continue
             ctype = part.get_content_type()
-            if ctype == "text/plain":
+            if body is None and ctype == "text/plain":
                 body = part.get_content()
-                break
-            elif ctype == "text/html":
-                html = part.get_content()
-                body = BeautifulSoup(html, "html.parser").get_text()
-                break
+            elif body is None and ctype == "text/html":
+                body = _html_body(part)
+            if _is_attachment(part):
+                attachments.append({
+                    "filename": part.get_filename() or f"unnamed_{len(attachments) + 1}",
+                    "content_type": ctype or "unknown",
+                    "size": _encoded_size(part),
+                })
+    elif msg.get_content_type() == "text/html":
+        body = _html_body(msg)
     else:
         body = msg.get_content()
-    return {"subject": subject, "from": sender, "body_text": body.strip()}
+    return {
+        "subject": msg["subject"],
+        "from": msg["from"],
+        "body_text": (body or "").strip(),
+        "attachments": attachments,
+    }
+
+def extract_email_parts(msg):
+    parts = inspect_message(msg)
+    return {"subject": parts["subject"], "from": parts["from"], "body_text": parts["body_text"]}
+
+def _analyses_from_docs(docs, features):
+    analyses = [{} for _ in docs]
+    if "entities" in features:
+        for analysis, doc in zip(analyses, docs):
+            analysis["entities"] = [ent.text for ent in doc.ents]
+    if "summary" in features:
+        for analysis, doc in zip(analyses, docs):
+            with metrics.stage("summary"):
+                analysis["summary"] = summarize_doc(doc)
+    if "similarity" in features:
+        with metrics.stage("similarity"):
+            scores = _profile_scorer.score([doc.vector for doc in docs])
+        ref = _profile_scorer.names.index(REFERENCE_PROFILE)
+        for analysis, row, (best, _) in zip(analyses, scores, _profile_scorer.best(scores)):
+            analysis["similarity"] = float(row[ref])
+            analysis["profile_scores"] = dict(zip(_profile_scorer.names, row.tolist()))
+            analysis["best_profile"] = best
+    return analyses
+
+def analyze_text(text, features=ALL_FEATURES):
+    """
+    Runs the spaCy pipeline once over `text` and returns its named entities,
+    its summary, its similarity to the reference threat description and its
+    score against every threat profile. `features` limits the work (and the
+    pipeline components run) to a subset of FEATURE_COMPONENTS.
+    """
+    return next(analyze_texts([text], features=features))
+
+def _clip(text, limit):
+    """`text` cut to at most `limit` characters, at the last whitespace before the limit when there is one."""
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit]
+
+def analyze_texts(texts, batch_size=32, features=ALL_FEATURES):
+    """
+    Batched version of `analyze_text`: streams the bodies through `nlp.pipe`
+    and yields one analysis dict per body, in input order. Each batch is
+    scored against all profiles in one matrix operation. Bodies are clipped
+    to MAX_SUMMARY_CHARS before parsing, so a huge body costs no more than
+    the budget (and never trips the pipeline's `max_length`).
+    """
+    nlp = get_nlp()
+    batch = []
+    limit = min(MAX_SUMMARY_CHARS, nlp.max_length - 1)
+    texts = (_clip(text, limit) for text in texts)
+    docs = nlp.pipe(texts, batch_size=batch_size, disable=_disabled_for(nlp, features))
+    while True:
+        with metrics.stage("spacy"):
+            doc = next(docs, None)
+        if doc is None:
+            break
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield from _analyses_from_docs(batch, features)
+            batch = []
+    if batch:
+        yield from _analyses_from_docs(batch, features)
 
 def get_named_entities(text):
-    doc = nlp(text)
-    return [ent.text for ent in doc.ents]
+    return analyze_text(text, features=("entities",))["entities"]
 
 def get_relevance_score(text):
-    doc = nlp(text)
-    reference = nlp("Critical, Cobalt Strike, cybersecurity, threat, affecting university systems, students, and campus infrastructure.")
-    return doc.similarity(reference)
+    return analyze_text(text, features=("similarity",))["similarity"]
+
+_summary_memo = SummaryMemo()
+
+def summarize_doc(doc, sentence_count=3, max_sentences=MAX_TEXTRANK_SENTENCES, max_chars=MAX_SUMMARY_CHARS):
+    """
+    Extractive summary built on the Doc's own sentence boundaries, so the
+    body is not tokenized a second time. Memoized by body hash. Bodies from
+    analyze_texts are already clipped; `max_chars` bounds Docs parsed elsewhere.
+    """
+    key = SummaryMemo.key(doc.text, sentence_count, max_sentences, max_chars)
+    summary = _summary_memo.get(key)
+    metrics.inc("summary_memo_hits" if summary is not None else "summary_memo_misses")
+    if summary is None:
+        sents = [sent for sent in doc.sents if sent.start_char < max_chars and sent.text.strip()]
+        summary = summarize_sentences(
+            [sent.text.strip() for sent in sents],
+            [[t.lower_ for t in sent if t.is_alpha and not t.is_stop] for sent in sents],
+            sentence_count, max_sentences,
+        )
+        _summary_memo.put(key, summary)
+    return summary
 
 def summarize_email(text, sentence_count=3):
-    parser = PlaintextParser.from_string(text, Tokenizer("english"))
-    summarizer = TextRankSummarizer()
-    summary = summarizer(parser.document, sentence_count)
-    return " ".join(str(sentence) for sentence in summary)
+    text = _clip(text, MAX_SUMMARY_CHARS)
+    summary = _summary_memo.get(SummaryMemo.key(text, sentence_count, MAX_TEXTRANK_SENTENCES, MAX_SUMMARY_CHARS))
+    if summary is None:
+        nlp = get_nlp()
+        summary = summarize_doc(nlp(text, disable=_disabled_for(nlp, ("summary",))), sentence_count)
+    return summary
+
+def match_keywords(text, keywords):
+    """Returns (keyword, start, end) for every watchlist keyword found in `text`."""
+    return compile_keywords(keywords).matches(text)
 
+# The 0.6 / 0.9 thresholds were tuned on the reference similarity alone; profile scores are
+# reported next to it (see best_profile) rather than fed into them.
 def classify_urgency(text, keywords, similarity_score):
-    text_lower = text.lower()
-    if any(k in text_lower for k in keywords):
+    with metrics.stage("keywords"):
+        keyword_hit = compile_keywords(keywords).search(text)
+    if keyword_hit:
         return "Red"
     if similarity_score > 0.9:
         return "Red"
@@ -64,23 +264,50 @@ def classify_urgency(text, keywords, similarity_score):
         return "Orange"
     return "Yellow"
 
-def generate_report(data, output_dir="output"):
-    os.makedirs(output_dir, exist_ok=True)
-    doc = Document()
-    doc.add_heading("Threat Report", 0)
+# — Report rendering: styles come from one template document, loaded once per process —
+REPORT_TEMPLATE = os.environ.get("THREAT_REPORT_TEMPLATE")  # optional .docx whose styles reports reuse
+_report_template = None
+
+def new_report_document():
+    global _report_template
+    from docx import Document
+    if _report_template is None:
+        buffer = io.BytesIO()
+        Document(REPORT_TEMPLATE).save(buffer)
+        _report_template = buffer.getvalue()
+    return Document(io.BytesIO(_report_template))
+
+def report_digest(data):
+    """Content hash of the fields a report is rendered from; stable across runs and processes."""
+    fields = {k: data.get(k) for k in ("subject", "from", "urgency", "summary", "entities")}
+    fields["body"] = data.get("body_text", data.get("body", ""))
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def add_report_section(doc, data, level=0):
+    doc.add_heading(f"Threat Report: {data['subject']}" if level else "Threat Report", level)
     doc.add_paragraph(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     doc.add_paragraph(f"Subject: {data['subject']}")
     doc.add_paragraph(f"From: {data['from']}")
     doc.add_paragraph(f"Urgency: {data['urgency']}")
-    doc.add_heading("Summary", level=1)
+    doc.add_heading("Summary", level=level + 1)
     doc.add_paragraph(data["summary"])
-    doc.add_heading("Named Entities", level=1)
+    doc.add_heading("Named Entities", level=level + 1)
     doc.add_paragraph(", ".join(data["entities"]))
-    doc.add_heading("Full Email Body", level=1)
-    doc.add_paragraph(data["body_text"])
+    doc.add_heading("Full Email Body", level=level + 1)
+    # One paragraph per blank-line-separated block rather than the whole body in one run.
+    for block in re.split(r"\n\s*\n", data.get("body_text", data.get("body", ""))):
+        if block.strip():
+            doc.add_paragraph(block.strip())
+
+def generate_report(data, output_dir="output"):
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage("report"):
+        doc = new_report_document()
+        add_report_section(doc, data)
 
-    filename = f"{output_dir}/ThreatReport_{data['urgency'].upper()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-    doc.save(filename)
+        # Named by content hash: distinct emails never collide, and re-exporting the same one is idempotent.
+        filename = f"{output_dir}/ThreatReport_{data['urgency'].upper()}_{report_digest(data)[:12]}.docx"
+        doc.save(filename)
     return filename
 
 # --- Bridge function for the security chatbot ---
@@ -88,4 +315,5 @@ def ask_sec_chatbot(question):
     """
     A bridge function to pass a question to the FoundationSec chatbot.
     """
+    from chatbot import get_featherless_response as get_sec_bot_response
     return get_sec_bot_response(question)
@@ -0,0 +1,196 @@
+# metrics.py
+
+import bisect
+import contextlib
+import cProfile
+import heapq
+import http.server
+import os
+import threading
+import time
+
+# — Off unless THREAT_METRICS is set; a disabled stage() costs one attribute check —
+ENABLED = os.environ.get("THREAT_METRICS", "") not in ("", "0")
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+_NULL = contextlib.nullcontext()
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "path", "start", "hook")
+
+    def __init__(self, metrics, stage, path):
+        self.metrics, self.stage, self.path = metrics, stage, path
+        self.hook = metrics.profile_hook(stage, path) if metrics.profile_hook else None
+
+    def __enter__(self):
+        if self.hook:
+            self.hook.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.hook:
+            self.hook.__exit__(*exc)
+        self.metrics.observe(self.stage, elapsed, self.path)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide pipeline metrics: a latency histogram per stage, named
+    counters and the slowest files seen. Snapshots are plain dicts, so
+    worker processes can ship theirs back to be merged by the parent.
+    """
+
+    def __init__(self, enabled=ENABLED, slowest=20):
+        self.enabled = enabled
+        self.slowest_size = slowest
+        self.profile_hook = None  # optional callable(stage, path) -> context manager wrapped around each stage
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}   # stage -> [bucket counts..., sum]
+            self.counters = {}
+            self.slowest = []      # min-heap of (seconds, path)
+
+    def stage(self, name, path=None):
+        """Context manager timing one stage; a shared no-op when metrics are disabled."""
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name, path)
+
+    def observe(self, stage, seconds, path=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.histograms.setdefault(stage, [0] * len(BUCKETS) + [0.0])
+            hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+            hist[-1] += seconds
+            if path is not None and stage == "email":
+                self._push_slowest(seconds, str(path))
+
+    def _push_slowest(self, seconds, path):
+        if len(self.slowest) < self.slowest_size:
+            heapq.heappush(self.slowest, (seconds, path))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, path))
+
+    def inc(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            snap = {
+                "histograms": {k: list(v) for k, v in self.histograms.items()},
+                "counters": dict(self.counters),
+                "slowest": sorted(self.slowest, reverse=True),
+            }
+        if reset:
+            self.reset()
+        return snap
+
+    def merge(self, snap):
+        """Adds another process's snapshot into this one."""
+        if not self.enabled or not snap:
+            return
+        with self._lock:
+            for stage, other in snap["histograms"].items():
+                hist = self.histograms.setdefault(stage, [0] * len(BUCKETS) + [0.0])
+                for i, value in enumerate(other):
+                    hist[i] += value
+            for name, value in snap["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for seconds, path in snap["slowest"]:
+                self._push_slowest(seconds, path)
+
+    def summary(self):
+        """Per-stage count, total and mean seconds, for display."""
+        rows = []
+        for stage, hist in sorted(self.snapshot()["histograms"].items()):
+            count = sum(hist[:-1])
+            rows.append({"stage": stage, "count": count, "total_s": round(hist[-1], 3),
+                         "mean_ms": round(hist[-1] / count * 1000, 2) if count else 0.0})
+        return rows
+
+    def render_prometheus(self):
+        snap = self.snapshot()
+        lines = ["# HELP threat_stage_seconds Triage pipeline stage latency.", "# TYPE threat_stage_seconds histogram"]
+        for stage, hist in sorted(snap["histograms"].items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'threat_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'threat_stage_seconds_sum{{stage="{stage}"}} {hist[-1]}')
+            lines.append(f'threat_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+        for name, value in sorted(snap["counters"].items()):
+            lines += [f"# TYPE threat_{name}_total counter", f"threat_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the text exposition atomically, e.g. for node_exporter's textfile collector."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """Serves /metrics on a daemon thread; returns the server."""
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+class CProfileHook:
+    """Profiling hook for `Metrics.profile_hook`: one cProfile.Profile per stage, dumpable to .prof files."""
+
+    def __init__(self, stages=None):
+        self.stages = set(stages) if stages else None
+        self.profiles = {}
+        self._active = threading.local()
+
+    def __call__(self, stage, path):
+        # Only one profiler can run at a time, so stages nested in a profiled stage are skipped.
+        if (self.stages is not None and stage not in self.stages) or getattr(self._active, "on", False):
+            return _NULL
+        profile = self.profiles.setdefault(stage, cProfile.Profile())
+
+        @contextlib.contextmanager
+        def run():
+            self._active.on = True
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                self._active.on = False
+
+        return run()
+
+    def dump(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for stage, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(directory, f"{stage}.prof"))
+
+
+metrics = Metrics()
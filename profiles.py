@@ -0,0 +1,50 @@
+# profiles.py
+
+import numpy as np
+
+# — Threat profiles: each description is embedded once and scored against every email —
+THREAT_PROFILES = {
+    "ransomware": "Ransomware attack encrypting files and servers, ransom demand, data extortion and leak site, double extortion.",
+    "phishing": "Phishing campaign stealing credentials, fake login page, malicious link, business email compromise, MFA fatigue.",
+    "canvas_cve": "Critical CVE vulnerability in Canvas LMS learning management system, patch required, remote code execution.",
+    "callista_cve": "Security vulnerability in Callista student management system, student records exposed, urgent patch.",
+    "studylink_cve": "Vulnerability advisory affecting StudyLink student finance portal, personal data exposure, exploit available.",
+    "c2_malware": "Malware beaconing to command and control servers, Cobalt Strike, backdoor, lateral movement, indicators of compromise.",
+    "data_breach": "Data breach leaking student and staff personal information, credentials dumped, stolen database.",
+}
+
+
+class ProfileScorer:
+    """
+    Scores document vectors against a set of named profile vectors.
+
+    All profile vectors live in one L2-normalised (profiles x dims) matrix, so
+    a batch of document vectors is scored with a single matrix product
+    instead of one `Doc.similarity` call per (email, profile) pair.
+    """
+
+    def __init__(self, names, vectors):
+        self.names = list(names)
+        self.matrix = self._normalise(np.asarray(vectors, dtype="float32"))
+
+    @classmethod
+    def from_texts(cls, nlp, profiles):
+        """Embeds each profile description with `nlp` (one `nlp.pipe` pass)."""
+        docs = nlp.pipe(profiles.values())
+        return cls(profiles.keys(), [doc.vector for doc in docs])
+
+    @staticmethod
+    def _normalise(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Zero vectors (empty or out-of-vocabulary text) score 0.0, as Doc.similarity does.
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    def score(self, doc_vectors):
+        """Returns the (documents x profiles) cosine similarity matrix."""
+        vectors = np.asarray(doc_vectors, dtype="float32").reshape(-1, self.matrix.shape[1])
+        return self._normalise(vectors) @ self.matrix.T
+
+    def best(self, scores):
+        """Returns (profile name, score) of the best match for each row of `scores`."""
+        idx = scores.argmax(axis=1)
+        return [(self.names[i], float(scores[row, i])) for row, i in enumerate(idx)]
@@ -0,0 +1,64 @@
+# report_export.py
+
+import hashlib
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from main import new_report_document, add_report_section, generate_report, report_digest
+
+# Below this many reports, starting worker processes costs more than it saves.
+PARALLEL_MIN_REPORTS = 16
+
+
+def _batch_name(records):
+    return hashlib.sha256("".join(sorted(report_digest(r) for r in records)).encode()).hexdigest()[:12]
+
+
+def _report_data(record):
+    # Only the fields a report needs cross the process boundary.
+    keys = ("subject", "from", "urgency", "summary", "entities", "body_text", "body")
+    return {k: record[k] for k in keys if k in record}
+
+
+def export_reports(records, output_dir="output", mode="files", workers=None):
+    """
+    Exports one report per record and returns the written path(s).
+
+    `mode` is "files" (one .docx per email, rendered in `workers` parallel
+    processes), "zip" (the same files bundled into one archive) or
+    "combined" (a single .docx with one section per email). All names are
+    content hashes, so concurrent or repeated exports never overwrite a
+    different report.
+    """
+    records = [_report_data(r) for r in records]
+    os.makedirs(output_dir, exist_ok=True)
+    if not records:
+        return []
+
+    if mode == "combined":
+        doc = new_report_document()
+        doc.add_heading(f"Threat Reports ({len(records)})", 0)
+        for i, data in enumerate(records):
+            if i:
+                doc.add_page_break()
+            add_report_section(doc, data, level=1)
+        path = os.path.join(output_dir, f"ThreatReports_{_batch_name(records)}.docx")
+        doc.save(path)
+        return [path]
+
+    workers = workers or min(len(records), os.cpu_count() or 1)
+    if workers > 1 and len(records) >= PARALLEL_MIN_REPORTS:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            paths = list(pool.map(generate_report, records, [output_dir] * len(records), chunksize=8))
+    else:
+        paths = [generate_report(data, output_dir) for data in records]
+
+    if mode == "zip":
+        archive = os.path.join(output_dir, f"ThreatReports_{_batch_name(records)}.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for path in dict.fromkeys(paths):
+                zf.write(path, os.path.basename(path))
+        return [archive]
+    return paths
@@ -0,0 +1,86 @@
+# search_index.py
+
+import re
+import sqlite3
+import threading
+
+# Column weights for bm25 ranking, in table column order.
+_WEIGHTS = {"subject": 6.0, "sender": 3.0, "summary": 3.0, "body": 1.0, "entities": 4.0, "attachments": 2.0}
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# Queries matching more rows than this (e.g. a two-letter prefix mid-keystroke) skip bm25,
+# whose cost grows with every match, and list the most recently indexed emails first.
+MAX_RANKED_MATCHES = 5000
+
+
+class SearchIndex:
+    """
+    Full-text index over analysed emails, backed by SQLite FTS5.
+
+    Covers subject, sender, summary, body, entities and attachment names and
+    is updated one record at a time as emails are ingested or removed, so a
+    query never rescans the mailbox. Queries are ranked with bm25 (newest
+    first past MAX_RANKED_MATCHES), every term is matched as a prefix (so
+    results update per keystroke), and results can be restricted to one
+    urgency level.
+    """
+
+    def __init__(self, path=":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS emails USING fts5("
+            "key UNINDEXED, urgency UNINDEXED, "
+            f"{', '.join(_WEIGHTS)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        # FTS5 can't index `key`, so deletes go through this key -> rowid map instead of a table scan.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS email_rows (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+
+    def update(self, records, removed=()):
+        """Indexes `records` (a dict of key -> email record) and drops `removed` keys."""
+        rows = [
+            (
+                str(key), record.get("urgency"), record.get("subject") or "", record.get("from") or "",
+                record.get("summary") or "", record.get("body") or "", " ".join(record.get("entities") or []),
+                " ".join(a["filename"] for a in record.get("attachments") or []),
+            )
+            for key, record in records.items()
+        ]
+        stale = [str(key) for key in (*records, *removed)]
+        with self._lock, self._conn:
+            for key in stale:
+                found = self._conn.execute("SELECT row FROM email_rows WHERE key = ?", (key,)).fetchone()
+                if found:
+                    self._conn.execute("DELETE FROM emails WHERE rowid = ?", found)
+                    self._conn.execute("DELETE FROM email_rows WHERE key = ?", (key,))
+            for row in rows:
+                cursor = self._conn.execute(f"INSERT INTO emails VALUES ({', '.join('?' * 8)})", row)
+                self._conn.execute("INSERT INTO email_rows VALUES (?, ?)", (row[0], cursor.lastrowid))
+
+    @staticmethod
+    def _match_expression(query):
+        # Each word becomes a quoted prefix term; FTS5 ANDs adjacent terms.
+        return " ".join(f'"{token}"*' for token in _TOKEN.findall(query))
+
+    def search(self, query, urgency=None, limit=None):
+        """
+        Returns (matching keys, best first, at most `limit` of them; total
+        number of matches). An empty query matches nothing.
+        """
+        expression = self._match_expression(query)
+        if not expression:
+            return [], 0
+        where = f"emails MATCH ?{' AND urgency = ?' if urgency else ''}"
+        params = [expression, *([urgency] if urgency else [])]
+        with self._lock:
+            # Counted before the urgency filter, which has to read each matching row.
+            (matches,) = self._conn.execute("SELECT count(*) FROM emails WHERE emails MATCH ?", [expression]).fetchone()
+            order = (f"bm25(emails, 0, 0, {', '.join(map(str, _WEIGHTS.values()))})"
+                     if matches <= MAX_RANKED_MATCHES else "rowid DESC")
+            sql = f"SELECT key FROM emails WHERE {where} ORDER BY {order} LIMIT ?"
+            keys = [key for (key,) in self._conn.execute(sql, [*params, -1 if limit is None else limit])]
+            if limit is None or len(keys) < limit:
+                return keys, len(keys)
+            if urgency:
+                (matches,) = self._conn.execute(f"SELECT count(*) FROM emails WHERE {where}", params).fetchone()
+            return keys, matches
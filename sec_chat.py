@@ -0,0 +1,211 @@
+# sec_chat.py
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+# — Backend selection: "featherless" (the chatbot module), "http" (OpenAI-compatible streaming API) or "stub" —
+DEFAULT_BACKEND = os.environ.get("SEC_CHAT_BACKEND", "featherless")
+DEFAULT_TIMEOUT = float(os.environ.get("SEC_CHAT_TIMEOUT", "60"))
+
+
+class FeatherlessBackend:
+    """Runs the existing blocking `ask_sec_chatbot` bridge in a thread; the answer arrives as one chunk."""
+
+    async def stream(self, prompt):
+        from main import ask_sec_chatbot
+        yield await asyncio.to_thread(ask_sec_chatbot, prompt)
+
+    async def aclose(self):
+        pass
+
+
+class HTTPBackend:
+    """
+    Streams tokens from an OpenAI-compatible /chat/completions endpoint over
+    one long-lived httpx.AsyncClient, so connections are pooled and reused
+    across questions. Configured by SEC_CHAT_API_URL, SEC_CHAT_API_KEY and
+    SEC_CHAT_MODEL. Needs httpx, which is only imported here.
+    """
+
+    def __init__(self, base_url=None, api_key=None, model=None):
+        import httpx
+        self.model = model or os.environ["SEC_CHAT_MODEL"]
+        self._client = httpx.AsyncClient(
+            base_url=base_url or os.environ["SEC_CHAT_API_URL"],
+            headers={"Authorization": f"Bearer {api_key or os.environ.get('SEC_CHAT_API_KEY', '')}"},
+            timeout=None,  # the per-request deadline is enforced by SecChatClient
+        )
+
+    async def stream(self, prompt):
+        body = {"model": self.model, "stream": True, "messages": [{"role": "user", "content": prompt}]}
+        async with self._client.stream("POST", "/chat/completions", json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class StubBackend:
+    """Offline stand-in with configurable first-token latency and per-token delay, for latency and load tests."""
+
+    def __init__(self, latency=0.2, token_delay=0.01, reply=None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.reply = reply
+
+    async def stream(self, prompt):
+        await asyncio.sleep(self.latency)
+        reply = self.reply or f"[stub] No live model is configured; you asked: {prompt.splitlines()[-1]}"
+        for word in reply.split(" "):
+            await asyncio.sleep(self.token_delay)
+            yield word + " "
+
+    async def aclose(self):
+        pass
+
+
+def make_backend(name=DEFAULT_BACKEND):
+    return {"featherless": FeatherlessBackend, "http": HTTPBackend, "stub": StubBackend}[name]()
+
+
+def _normalise(prompt):
+    return " ".join(prompt.casefold().split())
+
+
+class SecChatClient:
+    """
+    Async front end to the security chatbot.
+
+    Answers stream chunk by chunk under a per-request deadline, and completed
+    answers are kept in an LRU keyed by the normalised prompt plus the email
+    context, so a repeated question is served without going upstream. A
+    private event loop on a daemon thread lets synchronous callers such as
+    Streamlit consume the stream through `stream`.
+    """
+
+    def __init__(self, backend=None, timeout=DEFAULT_TIMEOUT, cache_size=256):
+        self.backend = backend or make_backend()
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(prompt, context=""):
+        return hashlib.sha1(f"{_normalise(prompt)}\0{context}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def compose(prompt, context=""):
+        return f"Context (email under review):\n{context}\n\nQuestion: {prompt}" if context else prompt
+
+    async def astream(self, prompt, context=""):
+        """Yields answer chunks; raises TimeoutError if the whole answer takes longer than `timeout`."""
+        key = self.cache_key(prompt, context)
+        if key in self._cache:
+            metrics.inc("chat_cache_hits")
+            self._cache.move_to_end(key)
+            yield self._cache[key]
+            return
+        metrics.inc("chat_cache_misses")
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        chunks = []
+        stream = self.backend.stream(self.compose(prompt, context)).__aiter__()
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError(f"chatbot did not answer within {self.timeout:g}s")
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"chatbot did not answer within {self.timeout:g}s") from None
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await stream.aclose()
+        metrics.observe("chatbot", time.perf_counter() - started)
+        self._cache[key] = "".join(chunks)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def ask(self, prompt, context=""):
+        return "".join([chunk async for chunk in self.astream(prompt, context)])
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="sec-chat-loop", daemon=True).start()
+        return self._loop
+
+    def stream(self, prompt, context=""):
+        """Synchronous generator over `astream`, run on the client's own event loop."""
+        chunks, done = queue.Queue(), object()
+
+        async def pump():
+            try:
+                async for chunk in self.astream(prompt, context):
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(done)
+
+        asyncio.run_coroutine_threadsafe(pump(), self._ensure_loop())
+        while (item := chunks.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+async def _load_test(client, questions, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(question):
+        async with semaphore:
+            start = time.perf_counter()
+            first = None
+            async for _ in client.astream(question):
+                first = first or time.perf_counter() - start
+            latencies.append((first, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in questions))
+    return time.perf_counter() - start, latencies
+
+
+if __name__ == "__main__":
+    # Offline latency/throughput check against the stub backend:
+    #   python sec_chat.py 200 20   -> 200 questions (half repeats), 20 in flight
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    client = SecChatClient(StubBackend())
+    questions = [f"Is advisory {i % (n // 2 or 1)} critical?" for i in range(n)]
+    elapsed, latencies = asyncio.run(_load_test(client, questions, concurrency))
+    firsts = sorted(f for f, _ in latencies)
+    print(f"{n} questions in {elapsed:.2f}s ({n / elapsed:.1f}/s), "
+          f"first-token p50 {firsts[len(firsts) // 2] * 1000:.0f} ms, p95 {firsts[int(len(firsts) * 0.95) - 1] * 1000:.0f} ms")
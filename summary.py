@@ -0,0 +1,88 @@
+# summary.py
+
+import hashlib
+import math
+from collections import Counter, OrderedDict
+
+# — Summarization budget —
+MAX_TEXTRANK_SENTENCES = 400   # TextRank's sentence graph is quadratic; longer bodies take the fast path
+MAX_SUMMARY_CHARS = 50_000     # bodies are clipped to this many characters before spaCy parses them
+MEMO_SIZE = 4096               # summaries remembered per process, keyed by body hash
+
+
+def _textrank_scores(word_sets, damping=0.85, iterations=50, tol=1e-6):
+    """
+    TextRank over sentences, with the edge weight of the original paper:
+    shared words / (log|a| + log|b|), then PageRank by power iteration.
+    """
+    import numpy as np  # deferred so importing main stays cheap
+
+    vocab = {}
+    rows, cols = [], []
+    for i, words in enumerate(word_sets):
+        for w in words:
+            rows.append(i)
+            cols.append(vocab.setdefault(w, len(vocab)))
+    n = len(word_sets)
+    incidence = np.zeros((n, max(len(vocab), 1)), dtype="float32")
+    incidence[rows, cols] = 1.0
+    overlap = incidence @ incidence.T
+    sizes = np.array([len(w) for w in word_sets], dtype="float32")
+    logs = np.log(np.maximum(sizes, 1.0))
+    denom = logs[:, None] + logs[None, :]
+    weights = np.divide(overlap, denom, out=np.zeros_like(overlap), where=denom > 0)
+    np.fill_diagonal(weights, 0.0)
+    out_weight = weights.sum(axis=1, keepdims=True)
+    transition = np.divide(weights, out_weight, out=np.zeros_like(weights), where=out_weight > 0)
+    scores = np.full(n, 1.0 / n, dtype="float32")
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def _frequency_scores(word_lists):
+    """Fast extractive fallback: mean corpus frequency of each sentence's words, linear in body length."""
+    freq = Counter(w for words in word_lists for w in words)
+    return [sum(freq[w] for w in words) / (1 + math.log1p(len(words))) if words else 0.0 for words in word_lists]
+
+
+def summarize_sentences(sentences, word_lists, sentence_count=3, max_sentences=MAX_TEXTRANK_SENTENCES):
+    """
+    Picks `sentence_count` sentences, returned in document order. Uses
+    TextRank up to `max_sentences` sentences and word-frequency scoring above.
+    """
+    if len(sentences) <= sentence_count:
+        return " ".join(sentences)
+    if len(sentences) <= max_sentences:
+        scores = _textrank_scores([set(words) for words in word_lists])
+    else:
+        scores = _frequency_scores(word_lists)
+    top = sorted(sorted(range(len(sentences)), key=lambda i: -scores[i])[:sentence_count])
+    return " ".join(sentences[i] for i in top)
+
+
+class SummaryMemo:
+    """Small LRU of summaries keyed by a hash of the body and the summary settings."""
+
+    def __init__(self, size=MEMO_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+
+    @staticmethod
+    def key(text, *settings):
+        return hashlib.sha1(f"{settings}\0{text}".encode("utf-8", "surrogatepass")).hexdigest()
+
+    def get(self, key):
+        if key in self._items:
+            self._items.move_to_end(key)
+            return self._items[key]
+        return None
+
+    def put(self, key, summary):
+        self._items[key] = summary
+        self._items.move_to_end(key)
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
@@ -0,0 +1,107 @@
+# test_html_text.py
+
+import importlib.util
+
+import pytest
+
+from html_text import BACKENDS, html_to_text
+
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+AVAILABLE = [name for name in BACKENDS if name != "lxml" or HAS_LXML]
+
+ADVISORY = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>Advisory</title>
+<style>.x { color: red }</style></head>
+<body><div class="wrap">
+  <h1>Critical   patch &amp; update</h1>
+  <p>Ransomware targeting <b>Canvas</b> LMS.<br>Apply the fix now.</p>
+  <script>var a = "<p>tracking</p>";</script>
+  <div style="display: none">hidden preheader</div>
+  <span hidden>also hidden</span>
+  <table><tr><td>CVE-2025-1111</td><td>9.8</td></tr><tr><td>CVE-2025-2222</td><td>7.5</td></tr></table>
+  <ul><li>one</li><li>two</li></ul>
+  <pre>line 1
+    line 2</pre>
+  <p>caf&eacute; &#8212; done<img src="x.png" hidden></p>
+</div></body></html>"""
+
+# Visible content only: no script, style, head or hidden elements for BeautifulSoup to keep.
+PLAIN = """<html><body><h2>Weekly digest</h2><p>First item about <a href="#">Okta</a>.</p>
+<div>Second <i>item</i> &lt;urgent&gt;</div><p>Third<br>line</p></body></html>"""
+
+# Omitted end tags on skipped elements: the skip must end where a browser closes the element.
+OMITTED_END_TAGS = [
+    "<html><head><title>x</title><body><p>Visible advisory text</p>",
+    "<ul><li hidden>secret<li>one<li>two</ul><p>after list</p>",
+    "<p style='display:none'>pre-header<p>Real body text here</p>",
+    "<ul><li hidden>a<ul><li>b<li>c</ul><li>d</ul><div><p hidden>x</div>after",
+    "<table><tr><td hidden>secret<td>cell</table><dl><dt hidden>term<dd>definition</dl>",
+]
+
+DOCUMENTS = [ADVISORY, PLAIN, "no markup at all", "<p>unclosed <b>bold", ""] + OMITTED_END_TAGS
+
+
+@pytest.mark.parametrize("backend", AVAILABLE)
+def test_advisory(backend):
+    assert html_to_text(ADVISORY, backend=backend) == (
+        "Critical patch & update\n\n"
+        "Ransomware targeting Canvas LMS.\nApply the fix now.\n\n"
+        "CVE-2025-1111 9.8\nCVE-2025-2222 7.5\n\n"
+        "one\ntwo\n\n"
+        "line 1\n    line 2\n\n"
+        "café — done"
+    )
+
+
+@pytest.mark.parametrize("backend", AVAILABLE)
+def test_drops_invisible_content(backend):
+    text = html_to_text(ADVISORY, backend=backend)
+    for invisible in ("Advisory", "color", "tracking", "hidden preheader", "also hidden"):
+        assert invisible not in text
+
+
+@pytest.mark.parametrize("backend", AVAILABLE)
+def test_line_breaks(backend):
+    assert html_to_text("text<br>more", backend=backend) == "text\nmore"
+    assert html_to_text("text<br><br>more", backend=backend) == "text\n\nmore"
+    assert html_to_text("text<br/><br/><br/>more", backend=backend) == "text\n\nmore"
+    assert html_to_text("<div>a</div><div>b</div><p>c</p>", backend=backend) == "a\nb\n\nc"
+
+
+@pytest.mark.parametrize("backend", AVAILABLE)
+def test_omitted_end_tags(backend):
+    texts = [html_to_text(html, backend=backend) for html in OMITTED_END_TAGS]
+    assert texts == [
+        "Visible advisory text",
+        "one\ntwo\n\nafter list",
+        "Real body text here",
+        "d\n\nafter",
+        "cell\n\ndefinition",
+    ]
+
+
+@pytest.mark.parametrize("backend", AVAILABLE)
+def test_max_chars(backend):
+    html = "<p>" + "ransomware alert " * 50_000 + "</p>"
+    text = html_to_text(html, max_chars=1000, backend=backend)
+    assert len(text) <= 1000
+    assert text.startswith("ransomware alert ransomware")
+
+
+@pytest.mark.skipif(not HAS_LXML, reason="lxml not installed")
+@pytest.mark.parametrize("html", DOCUMENTS)
+def test_backends_agree(html):
+    assert html_to_text(html, backend="lxml") == html_to_text(html, backend="stdlib")
+
+
+@pytest.mark.parametrize("html", [PLAIN, "no markup at all", "<p>unclosed <b>bold"])
+def test_visible_text_matches_beautifulsoup(html):
+    # Same characters as the previous get_text() path; only whitespace and line breaks differ.
+    bs4 = pytest.importorskip("bs4")
+    expected = "".join(bs4.BeautifulSoup(html, "html.parser").get_text().split())
+    assert "".join(html_to_text(html).split()) == expected
+
+
+def test_beautifulsoup_kept_what_we_drop():
+    bs4 = pytest.importorskip("bs4")
+    old = bs4.BeautifulSoup(ADVISORY, "html.parser").get_text()
+    assert "hidden preheader" in old and "hidden preheader" not in html_to_text(ADVISORY)
@@ -0,0 +1,258 @@
+# triage.py
+
+import io
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+from archives import read_message
+from dedup import ANALYSIS_FIELDS, profile_of, signature
+from metrics import metrics
+from main import (
+    MAX_SUMMARY_CHARS, _clip, parse_eml, inspect_message, analyze_texts, classify_urgency, match_keywords, preload,
+)
+
+
+def analyse_message(raw):
+    """Parses one raw .eml and returns its record, minus the spaCy-derived fields (summary included)."""
+    msg = parse_eml(io.BytesIO(raw))
+    parts = inspect_message(msg)
+    attachments = parts['attachments']
+    return {
+        "subject": str(parts['subject'] or "No Subject"), "from": str(parts['from'] or "Unknown Sender"),
+        "body": parts['body_text'],
+        "has_attachments": bool(attachments), "attachments": attachments, "attachment_count": len(attachments),
+        "email_date": str(msg.get('Date', 'Unknown Date')), "email_id": msg.get('Message-ID') and str(msg.get('Message-ID')),
+    }
+
+
+def prepare_batch(paths, keywords=()):
+    """
+    First, cheap half of the pipeline: reads and parses each file (or
+    archived message, see archives.read_message) and computes its dedup
+    signature here, in the worker, over the same clipped text spaCy will
+    see. Returns (path, record, elapsed) tuples, or (path, None, error).
+    """
+    results = []
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            record = analyse_message(read_message(path))
+            record.update(signature(_clip(record['body'], MAX_SUMMARY_CHARS), keywords))
+            record['duplicate_of'] = None
+            results.append((path, record, time.perf_counter() - start))
+        except Exception as e:
+            metrics.inc("failures")
+            results.append((path, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _finish(path, record, keywords, elapsed):
+    record['keyword_hits'] = match_keywords(record['body'], keywords)
+    record['urgency'] = classify_urgency(record['body'], keywords, record['similarity_score'])
+    record['triage_seconds'] = elapsed
+    metrics.observe("email", elapsed, path)
+    metrics.inc("emails_processed")
+    return path, record, None
+
+
+def _analyse_bodies(prepared):
+    # One batched spaCy pass; if it raises, every body is retried alone so only the bad one fails.
+    try:
+        return list(analyze_texts([r['body'] for _, r, _ in prepared]))
+    except Exception:
+        analyses = []
+        for _, record, _ in prepared:
+            try:
+                analyses.append(next(analyze_texts([record['body']])))
+            except Exception as e:
+                analyses.append(e)
+        return analyses
+
+
+def complete_batch(prepared, keywords):
+    """Second, expensive half: one batched spaCy pass over prepared (path, record, elapsed) tuples."""
+    start = time.perf_counter()
+    analyses = _analyse_bodies(prepared)
+    nlp_share = (time.perf_counter() - start) / max(len(prepared), 1)
+    results = []
+    for (path, record, elapsed), analysis in zip(prepared, analyses):
+        if isinstance(analysis, Exception):
+            metrics.inc("failures")
+            results.append((path, None, f"{type(analysis).__name__}: {analysis}"))
+            continue
+        record['entities'] = analysis['entities']
+        record['summary'] = analysis['summary']
+        record['similarity_score'] = float(analysis['similarity'])
+        record['profile_scores'] = analysis['profile_scores']
+        record['best_profile'] = analysis['best_profile']
+        # "email" is the whole per-file cost: its own parsing plus an equal share of the batch's spaCy time.
+        results.append(_finish(path, record, keywords, elapsed + nlp_share))
+    return results
+
+
+def triage_batch(paths, keywords):
+    """
+    Runs the full per-file pipeline over `paths` and returns a list of
+    (path, record, error) tuples. Failures are isolated per file: a bad file
+    yields (path, None, message) and the rest of the batch carries on.
+    """
+    prepared = prepare_batch(paths, keywords)
+    failed = [item for item in prepared if item[1] is None]
+    return failed + complete_batch([item for item in prepared if item[1] is not None], keywords)
+
+
+def _in_worker(fn, args, metrics_enabled):
+    # Workers keep their own Metrics; the parent merges the snapshot shipped back with each batch.
+    metrics.enabled = metrics_enabled
+    return fn(*args), metrics.snapshot(reset=True)
+
+
+def _submit(executor, fn, *args):
+    if executor is not None:
+        return executor.submit(_in_worker, fn, args, metrics.enabled)
+    future = Future()
+    try:
+        future.set_result((fn(*args), None))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def make_executor(workers):
+    """
+    Creates a pool of `workers` processes for `iter_triage`. Workers are
+    spawned rather than forked (the dashboard runs threads), and each one
+    preloads the spaCy model once at start-up, then keeps it for every batch
+    it is given.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=preload,
+    )
+
+
+def iter_triage(paths, keywords, executor=None, batch_size=8, dedup=None, workers=1):
+    """
+    Yields (path, record, error) for every path. With an `executor`, batches
+    of `batch_size` files are spread across its workers and results stream
+    back in completion order; callers that need a stable order (e.g. ctime)
+    re-sort. Without one, batches run in-process. `paths` may be any
+    iterable of file paths and archives.MessageRef addresses, e.g.
+    archives.iter_mbox(...), and is consumed batch by batch.
+
+    With a `dedup` NearDuplicateIndex, files are parsed and fingerprinted
+    first; a body within the index's distance of an already-analysed one
+    reuses that analysis (and gets `duplicate_of` set) instead of going
+    through spaCy, so analysis cost follows the number of unique bodies.
+    `workers` (the executor's pool size) bounds how many batches are in
+    flight at once.
+    """
+    # Batches are cut lazily so an archive iterator is only walked as far as triage has got.
+    paths = iter(paths)
+    batches = iter(lambda: list(itertools.islice(paths, batch_size)), [])
+    keywords = list(keywords)
+    if dedup is not None:
+        yield from _iter_triage_dedup(batches, keywords, executor, batch_size, dedup, workers)
+        return
+    if executor is None:
+        for batch in batches:
+            yield from triage_batch(batch, keywords)
+        return
+    # At most 2 * workers batches in flight, each dropped once drained, so neither the
+    # input nor its results pile up ahead of the consumer.
+    futures = {}
+    for batch in batches:
+        futures[_submit(executor, triage_batch, batch, keywords)] = batch
+        if len(futures) >= 2 * workers:
+            done = next(as_completed(futures))
+            yield from _drain(done, futures.pop(done))
+    while futures:
+        done = next(as_completed(futures))
+        yield from _drain(done, futures.pop(done))
+
+
+def _drain(future, paths):
+    try:
+        results, snapshot = future.result()
+        metrics.merge(snapshot)
+        return results
+    except Exception as e:
+        # A worker died mid-batch (e.g. the pool broke); report the batch, keep draining the rest.
+        return [(path, None, f"{type(e).__name__}: {e}") for path in paths]
+
+
+def _iter_triage_dedup(batches, keywords, executor, batch_size, dedup, workers):
+    # Parse batches are submitted a few at a time so parsed bodies don't pile up ahead of spaCy.
+    pending_batches = iter(batches)
+    inflight = 2 * workers if executor is not None else 1
+    prepare, complete = {}, {}
+    queued, waiting = [], {}  # waiting: canonical key -> duplicates held until its analysis lands
+
+    def top_up():
+        while len(prepare) + len(complete) < inflight:
+            batch = next(pending_batches, None)
+            if batch is None:
+                return
+            prepare[_submit(executor, prepare_batch, batch, keywords)] = batch
+
+    def flush():
+        while len(queued) >= batch_size:
+            batch = queued[:batch_size]
+            del queued[:batch_size]
+            complete[_submit(executor, complete_batch, batch, keywords)] = [p for p, _, _ in batch]
+
+    def reuse(path, record, elapsed, analysis, original):
+        record.update(analysis, duplicate_of=original)
+        metrics.inc("duplicates_skipped")
+        return _finish(path, record, keywords, elapsed)
+
+    top_up()
+    while prepare or complete or queued or waiting:
+        if not prepare and not complete:
+            if not queued:
+                # Copies of an original that never got analysed (e.g. an interrupted earlier run) go on their own.
+                for key, held in waiting.items():
+                    dedup.remove(key)
+                    queued.extend(held)
+                waiting.clear()
+            # Everything is parsed; send the last partial batch to spaCy.
+            complete[_submit(executor, complete_batch, queued[:], keywords)] = [p for p, _, _ in queued]
+            queued.clear()
+        done = next(as_completed([*prepare, *complete]))
+        if done in prepare:
+            for path, record, info in _drain(done, prepare.pop(done)):
+                if record is None:
+                    yield path, None, info
+                    continue
+                dedup.remove(str(path))  # a re-analysed file must not match its own stale entry
+                if record['fingerprint'] is None:
+                    queued.append((path, record, info))  # too short to tell apart from other short bodies
+                    continue
+                fp = int(record['fingerprint'], 16)
+                profile = profile_of(record)
+                original = dedup.find(fp, profile)
+                if original is None:
+                    dedup.add(str(path), fp, profile=profile)
+                    queued.append((path, record, info))
+                elif dedup.analysis(original) is not None:
+                    yield reuse(path, record, info, dedup.analysis(original), original)
+                else:
+                    waiting.setdefault(original, []).append((path, record, info))
+        else:
+            for path, record, error in _drain(done, complete.pop(done)):
+                key = str(path)
+                held = waiting.pop(key, [])
+                if record is None:
+                    # The canonical copy failed: analyse the held duplicates on their own instead.
+                    dedup.remove(key)
+                    queued.extend(held)
+                    yield path, None, error
+                    continue
+                analysis = {f: record[f] for f in ANALYSIS_FIELDS}
+                dedup.set_analysis(key, analysis)
+                yield path, record, None
+                for item in held:
+                    yield reuse(*item, analysis, key)
+        flush()
+        top_up()
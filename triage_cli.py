@@ -0,0 +1,101 @@
+# triage_cli.py
+"""
+Headless batch triage: runs the main.py pipeline over .eml files, mbox
+archives and Maildir trees and streams one JSON record per email, without
+importing Streamlit.
+
+    python triage_cli.py ~/mail/advisories -j 4 -o triage.jsonl --checkpoint triage.ckpt
+    python triage_cli.py feeds/2019.mbox ~/Maildir -o history.jsonl
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from pathlib import Path
+
+from archives import is_maildir, iter_maildir, iter_messages
+from dedup import NearDuplicateIndex
+from keywords import load_watchlist
+from triage import iter_triage, make_executor
+
+
+def collect_paths(sources):
+    """
+    Lazily expands directories (Maildir trees message by message, others to
+    their *.eml files), glob patterns and file paths; mbox archives expand to
+    one archives.MessageRef per message.
+    """
+    for source in sources:
+        if is_maildir(source):
+            yield from iter_maildir(source)
+        elif os.path.isdir(source):
+            yield from sorted(Path(source).glob("*.eml"))
+        elif glob.has_magic(source):
+            for path in sorted(glob.glob(source, recursive=True)):
+                yield from iter_messages(path)
+        else:
+            yield from iter_messages(source)
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as fh:
+        return {line.rstrip("\n") for line in fh if line.strip()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triage .eml files and write one JSON record per email.")
+    parser.add_argument("sources", nargs="+", help="directories, Maildirs, mbox archives, glob patterns or .eml files")
+    parser.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="worker processes (default: 1, in-process)")
+    parser.add_argument("--batch-size", type=int, default=8, help="files per worker batch")
+    parser.add_argument("--checkpoint", help="file of triaged paths; listed paths are skipped on resume, failed ones retried")
+    parser.add_argument("-k", "--keyword", action="append", dest="keywords",
+                        help="urgency keyword (repeatable; added to the watchlist)")
+    parser.add_argument("--watchlist", help="file of urgency keywords, one per line (default: built-in list)")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="analyse every file, even near-duplicates of one already analysed in this run")
+    args = parser.parse_args(argv)
+
+    done = load_checkpoint(args.checkpoint)
+    paths = (p for p in collect_paths(args.sources) if str(p) not in done)
+    keywords = load_watchlist(args.watchlist) + (args.keywords or [])
+
+    out = open(args.output, "a" if done else "w", encoding="utf-8") if args.output else sys.stdout
+    checkpoint = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint else None
+    executor = make_executor(args.workers) if args.workers > 1 else None
+    dedup = None if args.no_dedup else NearDuplicateIndex()
+    triaged = failures = duplicates = 0
+    try:
+        for path, record, error in iter_triage(paths, keywords, executor, args.batch_size, dedup, args.workers):
+            triaged += 1
+            if error:
+                failures += 1
+                print(f"Failed to process {path}: {error}", file=sys.stderr)
+                record = {"error": error}
+            else:
+                duplicates += bool(record.get("duplicate_of"))
+                record = {k: v for k, v in record.items() if k != "shingles"}  # packed dedup hashes; no use downstream
+            out.write(json.dumps(dict(record, path=str(path)), ensure_ascii=False) + "\n")
+            out.flush()
+            if checkpoint and not error:
+                # Only successes are checkpointed, so failed paths (e.g. a batch lost to a dead worker) are retried on resume.
+                checkpoint.write(f"{path}\n")
+                checkpoint.flush()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+        if checkpoint:
+            checkpoint.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"Triaged {triaged} emails ({failures} failed, {duplicates} near-duplicates reused, "
+          f"{len(done)} skipped from checkpoint)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())